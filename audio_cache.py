@@ -0,0 +1,179 @@
+"""
+Audio Cache module for EchoMind
+Shared, de-duplicated cache of downloaded YouTube audio keyed by video id.
+Concurrent requests for the same video wait for a single download, files are
+checksum-verified on every hit, and the cache is kept under a disk quota by
+evicting the least recently used videos.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from download import (
+    DOWNLOAD_DIR, download_video_audio, stream_audio_segments, segment_audio,
+    extract_video_id, delete_download,
+)
+from audio_processing import get_speech_encoding
+
+AUDIO_CACHE_DIR = os.path.join(DOWNLOAD_DIR, "cache")
+os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+_locks_guard = threading.Lock()
+_video_locks = {}
+
+
+def _video_lock(video_id):
+    """One lock per video id, so concurrent requests for the same video coalesce."""
+    with _locks_guard:
+        if video_id not in _video_locks:
+            _video_locks[video_id] = threading.Lock()
+        return _video_locks[video_id]
+
+
+def _entry_path(video_id):
+    return os.path.join(AUDIO_CACHE_DIR, f"{video_id}.json")
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_entry(video_id):
+    try:
+        with open(_entry_path(video_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_entry(video_id, entry):
+    with open(_entry_path(video_id), "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+
+
+def _remove_entry(video_id, entry=None):
+    entry = entry or _read_entry(video_id) or {}
+    if entry.get("filename"):
+        delete_download(os.path.join(AUDIO_CACHE_DIR, entry["filename"]))
+    delete_download(_entry_path(video_id))
+
+
+def lookup_cached_audio(video_id):
+    """
+    Return the path of a cached, checksum-verified audio file for this video, or None.
+    Corrupt or missing files are dropped from the cache.
+    """
+    entry = _read_entry(video_id) if video_id else None
+    if not entry:
+        return None
+    path = os.path.join(AUDIO_CACHE_DIR, entry.get("filename", ""))
+    if not os.path.isfile(path) or _file_sha256(path) != entry.get("sha256"):
+        print(f"Cached audio for {video_id} failed verification, discarding it")
+        _remove_entry(video_id, entry)
+        return None
+    entry["last_used"] = time.time()
+    _write_entry(video_id, entry)
+    return path
+
+
+def _store(video_id, path):
+    """Register a finished file in the cache and enforce the quota."""
+    entry = {
+        "video_id": video_id,
+        "filename": os.path.basename(path),
+        "sha256": _file_sha256(path),
+        "size": os.path.getsize(path),
+        "created": time.time(),
+        "last_used": time.time(),
+    }
+    _write_entry(video_id, entry)
+    enforce_cache_quota(keep=video_id)
+    return path
+
+
+def enforce_cache_quota(max_bytes=AUDIO_CACHE_MAX_BYTES, keep=None):
+    """Evict least recently used videos until the cache fits in `max_bytes`."""
+    entries = []
+    for name in os.listdir(AUDIO_CACHE_DIR):
+        if name.endswith(".json"):
+            entry = _read_entry(name[:-len(".json")])
+            if entry:
+                entries.append(entry)
+
+    total = sum(entry.get("size", 0) for entry in entries)
+    for entry in sorted(entries, key=lambda e: e.get("last_used", 0)):
+        if total <= max_bytes:
+            break
+        video_id = entry.get("video_id")
+        if video_id == keep:
+            continue
+        lock = _video_lock(video_id)
+        # Skip videos that are being downloaded or read right now
+        if not lock.acquire(blocking=False):
+            continue
+        try:
+            _remove_entry(video_id, entry)
+            total -= entry.get("size", 0)
+            print(f"Evicted cached audio for {video_id}")
+        finally:
+            lock.release()
+    return total
+
+
+def cached_download(url, external_logger=lambda x: None):
+    """
+    Return (path, cached) for the audio of a YouTube link.
+    When the video id is known the file lives in the shared cache and must not
+    be deleted by the caller (cached=True); otherwise this is a plain download.
+    """
+    video_id = extract_video_id(url)
+    if not video_id:
+        return download_video_audio(url, external_logger), False
+
+    with _video_lock(video_id):
+        path = lookup_cached_audio(video_id)
+        if path:
+            external_logger("Using cached audio for this video.")
+            return path, True
+        outtmpl = os.path.join(AUDIO_CACHE_DIR, f"{video_id}.%(ext)s")
+        path = download_video_audio(url, external_logger, outtmpl=outtmpl)
+        if path is None or not os.path.isfile(path):
+            return path, False
+        return _store(video_id, path), True
+
+
+def cached_audio_segments(url, work_dir, external_logger=lambda x: None):
+    """
+    Yield overlapping segments for a YouTube link, like stream_audio_segments().
+    A cached copy is segmented locally; otherwise the stream is downloaded once,
+    segmented on the fly and saved to the cache in the same ffmpeg pass.
+    """
+    video_id = extract_video_id(url)
+    if not video_id:
+        yield from stream_audio_segments(url, work_dir, external_logger)
+        return
+
+    with _video_lock(video_id):
+        path = lookup_cached_audio(video_id)
+        if path:
+            external_logger("Using cached audio for this video.")
+            yield from segment_audio(path, work_dir, external_logger)
+            return
+
+        _, extension = get_speech_encoding()
+        partial_path = os.path.join(AUDIO_CACHE_DIR, f"{video_id}.partial{extension}")
+        final_path = os.path.join(AUDIO_CACHE_DIR, f"{video_id}{extension}")
+        try:
+            yield from stream_audio_segments(url, work_dir, external_logger, copy_path=partial_path)
+            os.replace(partial_path, final_path)
+            _store(video_id, final_path)
+        finally:
+            if os.path.exists(partial_path):
+                delete_download(partial_path)
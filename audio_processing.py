@@ -0,0 +1,133 @@
+"""
+Audio Processing module for EchoMind
+Thin wrappers around ffmpeg/ffprobe used to measure, cut and re-encode audio files.
+"""
+import os
+import re
+import shutil
+import subprocess
+
+# Speech recognition only needs 16 kHz mono; a low bitrate keeps uploads small
+AUDIO_CODEC = os.environ.get("AUDIO_CODEC", "opus")
+AUDIO_BITRATE = os.environ.get("AUDIO_BITRATE", "32k")
+AUDIO_SAMPLE_RATE = 16000
+
+# codec name -> (ffmpeg encoder, file extension accepted by Whisper)
+SPEECH_CODECS = {
+    "opus": ("libopus", ".ogg"),
+    "mp3": ("libmp3lame", ".mp3"),
+    "flac": ("flac", ".flac"),
+    "wav": ("pcm_s16le", ".wav"),
+}
+
+
+def check_ffprobe_available():
+    """Check if ffmpeg and ffprobe are both available in the system"""
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def get_speech_encoding(codec: str = None, bitrate: str = None):
+    """
+    Return (ffmpeg output arguments, file extension) for 16 kHz mono speech audio.
+    Unknown codecs fall back to MP3; lossless codecs ignore the bitrate.
+    """
+    codec = (codec or AUDIO_CODEC).lower()
+    bitrate = bitrate or AUDIO_BITRATE
+    encoder, extension = SPEECH_CODECS.get(codec, SPEECH_CODECS["mp3"])
+    args = ["-vn", "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE), "-c:a", encoder]
+    if codec in ("opus", "mp3"):
+        args += ["-b:a", bitrate]
+    if codec == "opus":
+        args += ["-application", "voip"]
+    return args, extension
+
+
+def normalize_audio(path: str, codec: str = None, bitrate: str = None) -> str:
+    """
+    Convert any audio/video file to compact 16 kHz mono speech audio.
+    The result is written next to the input file and its path is returned.
+    """
+    args, extension = get_speech_encoding(codec, bitrate)
+    output_path = os.path.splitext(path)[0] + "_speech" + extension
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", path] + args + [output_path],
+        check=True,
+        capture_output=True,
+    )
+    print(f"Normalized audio {os.path.getsize(path)} -> {os.path.getsize(output_path)} bytes")
+    return output_path
+
+
+def get_audio_duration(path: str) -> float:
+    """Return the duration of an audio file in seconds (0.0 if it cannot be read)."""
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-show_entries", "format=duration",
+                "-of", "default=noprint_wrappers=1:nokey=1",
+                path,
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return float(result.stdout.strip() or 0.0)
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        print(f"Could not read duration of {path}: {e}")
+        return 0.0
+
+
+def detect_silences(path: str, noise_db: int = -35, min_silence: float = 0.5) -> list:
+    """
+    Run ffmpeg's silencedetect filter over a file.
+    Returns a list of (start, end) tuples in seconds.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-nostats",
+                "-i", path,
+                "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+                "-f", "null", "-",
+            ],
+            capture_output=True,
+            text=True,
+        )
+    except OSError as e:
+        print(f"Silence detection failed for {path}: {e}")
+        return []
+
+    starts = [float(m) for m in re.findall(r"silence_start: (-?[\d.]+)", result.stderr)]
+    ends = [float(m) for m in re.findall(r"silence_end: ([\d.]+)", result.stderr)]
+    return [(max(start, 0.0), end) for start, end in zip(starts, ends)]
+
+
+def extract_segment(path: str, start: float, end: float, output_path: str) -> str:
+    """
+    Cut [start, end) out of an audio file and re-encode it as speech audio.
+    The extension of `output_path` should match get_speech_encoding().
+    Returns the output path.
+    """
+    args, _ = get_speech_encoding()
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", f"{start:.3f}",
+            "-t", f"{max(end - start, 0.0):.3f}",
+            "-i", path,
+        ] + args + [output_path],
+        check=True,
+        capture_output=True,
+    )
+    return output_path
+
+
+def cleanup_files(paths):
+    """Remove temporary files, ignoring any that are already gone."""
+    for path in paths:
+        try:
+            if path and os.path.isfile(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"Could not remove temporary file {path}: {e}")
@@ -1,18 +1,36 @@
 from __future__ import unicode_literals
 import yt_dlp as youtube_dl
 import os
+import re
+import json
 import time
 import shutil 
+import subprocess
+from audio_processing import get_speech_encoding, AUDIO_BITRATE, AUDIO_SAMPLE_RATE
 
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB
 FILE_TOO_LARGE_MESSAGE = "The audio file is too large for the current size and rate limits using Whisper. If you used a YouTube link, please try a shorter video clip. If you uploaded an audio file, try trimming or compressing the audio to under 100 MB."
 max_retries = 3
 delay = 2
+STREAM_SEGMENT_SECONDS = int(os.environ.get("STREAM_SEGMENT_SECONDS", 300))
+# Neighbouring stream segments share this much audio so words on a boundary survive
+STREAM_SEGMENT_OVERLAP = float(os.environ.get("TRANSCRIBE_CHUNK_OVERLAP", 2.0))
+STREAM_POLL_INTERVAL = 0.5
 
 # Ensure downloads directory exists
 DOWNLOAD_DIR = "./downloads/audio"
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
+# Resolved video metadata, one JSON file per video id
+VIDEO_INFO_DIR = "./downloads/info"
+os.makedirs(VIDEO_INFO_DIR, exist_ok=True)
+# Stream URLs inside a resolved info dict expire after a few hours
+INFO_CACHE_TTL = int(os.environ.get("VIDEO_INFO_CACHE_TTL", 4 * 60 * 60))
+INFO_CACHE_MAX_BYTES = int(os.environ.get("VIDEO_INFO_CACHE_MAX_BYTES", 20 * 1024 * 1024))
+# Only these caption formats are ever read back (see youtube_captions)
+CACHED_CAPTION_FORMATS = ("json3", "vtt")
+YOUTUBE_ID_PATTERN = re.compile(r"(?:v=|/shorts/|/live/|/embed/|youtu\.be/)([A-Za-z0-9_-]{11})")
+
 
 class MyLogger(object):
     def __init__(self, external_logger=lambda x: None):
@@ -40,15 +58,18 @@ def check_ffmpeg_available():
     import shutil
     return shutil.which("ffmpeg") is not None
 
-def get_ydl_opts(external_logger=lambda x: None, use_ffmpeg=True):
+def get_ydl_opts(external_logger=lambda x: None, use_ffmpeg=True, outtmpl=None):
     """
     Get yt-dlp options. If ffmpeg is not available, skip postprocessing.
     """
     opts = {
         "format": "bestaudio/best",
         "logger": MyLogger(external_logger),
-        "outtmpl": os.path.join(DOWNLOAD_DIR, "%(title)s.%(ext)s"),
+        "outtmpl": outtmpl or os.path.join(DOWNLOAD_DIR, "%(title)s.%(ext)s"),
         "progress_hooks": [my_hook],
+        # Keep .part files and resume them when the same file is requested again
+        "continuedl": True,
+        "nopart": False,
     }
     
     # Only add postprocessor if ffmpeg is available
@@ -57,9 +78,11 @@ def get_ydl_opts(external_logger=lambda x: None, use_ffmpeg=True):
             {
                 "key": "FFmpegExtractAudio",
                 "preferredcodec": "mp3",
-                "preferredquality": "192",  # set the preferred bitrate to 192kbps
+                "preferredquality": AUDIO_BITRATE.rstrip("kK"),  # speech-quality bitrate, not 192kbps
             }
         ]
+        # Whisper resamples to 16 kHz mono anyway, so don't download stereo
+        opts["postprocessor_args"] = {"extractaudio": ["-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE)]}
     else:
         # Try to get audio in a format that doesn't need conversion
         # Prefer formats that are already audio-only
@@ -69,25 +92,148 @@ def get_ydl_opts(external_logger=lambda x: None, use_ffmpeg=True):
     return opts
 
 
-def download_video_audio(url, external_logger=lambda x: None):
+def extract_video_id(url):
+    """Return the 11 character YouTube video id from a URL, or None."""
+    match = YOUTUBE_ID_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+
+def _video_info_path(video_id):
+    return os.path.join(VIDEO_INFO_DIR, f"{video_id}.json")
+
+
+def load_cached_video_info(video_id, max_age=INFO_CACHE_TTL):
+    """Return a cached info dict for this video id if it is younger than `max_age` seconds."""
+    if not video_id:
+        return None
+    path = _video_info_path(video_id)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if max_age is not None and time.time() - entry.get("fetched_at", 0) > max_age:
+        return None
+    return entry.get("info")
+
+
+def _compact_caption_tracks(tracks):
+    """
+    Keep only caption tracks in the spoken language: machine translations into every
+    other language make up most of an info dict and are never used for transcripts.
+    """
+    compact = {}
+    for lang, formats in (tracks or {}).items():
+        usable = [
+            fmt for fmt in formats or []
+            if fmt.get("ext") in CACHED_CAPTION_FORMATS and "tlang=" not in (fmt.get("url") or "")
+        ]
+        if usable:
+            compact[lang] = usable
+    return compact
+
+
+def save_video_info(info):
+    """
+    Persist a resolved info dict, without thumbnails, video-only formats and
+    translated caption tracks, keyed by video id.
+    """
+    video_id = info.get("id")
+    if not video_id:
+        return
+    info = {key: value for key, value in info.items() if key not in ("thumbnails", "heatmap", "storyboards")}
+    info["formats"] = [fmt for fmt in info.get("formats") or [] if fmt.get("acodec") not in (None, "none")]
+    for source in ("subtitles", "automatic_captions"):
+        if source in info:
+            info[source] = _compact_caption_tracks(info[source])
+    try:
+        with open(_video_info_path(video_id), "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "info": info}, f)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Could not cache video info for {video_id}: {e}")
+        return
+    enforce_info_cache_limit()
+
+
+def enforce_info_cache_limit(max_bytes=INFO_CACHE_MAX_BYTES):
+    """Delete the least recently written info files until the info cache fits in `max_bytes`."""
+    entries = []
+    for name in os.listdir(VIDEO_INFO_DIR):
+        path = os.path.join(VIDEO_INFO_DIR, name)
+        try:
+            entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        delete_download(path)
+        total -= size
+    return total
+
+
+def invalidate_video_info(video_id):
+    if video_id:
+        delete_download(_video_info_path(video_id))
+
+
+def resolve_video_info(ydl, url):
+    """
+    Resolve a video once: use the cached info dict if it is still fresh,
+    otherwise extract it with yt-dlp and cache the result.
+    Returns (info, from_cache).
+    """
+    info = load_cached_video_info(extract_video_id(url))
+    if info is not None:
+        print("Using cached video info for ", url)
+        return info, True
+    info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+    save_video_info(info)
+    return info, False
+
+
+def estimate_info_size(info):
+    """
+    Estimate the download size of a yt-dlp info dict in bytes.
+    Uses filesize, then filesize_approx, then bitrate x duration. Returns 0 if unknown.
+    """
+    formats = info.get("requested_formats") or [info]
+    total = 0
+    for fmt in formats:
+        size = fmt.get("filesize") or fmt.get("filesize_approx")
+        if not size:
+            bitrate_kbps = fmt.get("abr") or fmt.get("tbr") or 0
+            size = bitrate_kbps * 1000 / 8 * (info.get("duration") or 0)
+        total += size or 0
+    return int(total)
+
+
+def download_video_audio(url, external_logger=lambda x: None, outtmpl=None):
     retries = 0
     ffmpeg_available = check_ffmpeg_available()
+    info = None
+    from_cache = False
     
     while retries < max_retries:
         try:
             # First try with ffmpeg if available
             use_ffmpeg = ffmpeg_available and retries == 0
-            ydl_opts = get_ydl_opts(external_logger, use_ffmpeg=use_ffmpeg)
+            ydl_opts = get_ydl_opts(external_logger, use_ffmpeg=use_ffmpeg, outtmpl=outtmpl)
             
             with youtube_dl.YoutubeDL(ydl_opts) as ydl:
                 print("Going to download ", url)
-                info = ydl.extract_info(url, download=False)
-                filesize = info.get("filesize", 0)
-                if filesize > MAX_FILE_SIZE:
+                # Resolve once and reuse the info dict across retries
+                if info is None:
+                    info, from_cache = resolve_video_info(ydl, url)
+                filesize = estimate_info_size(info)
+                # Long files are chunked before transcription when ffmpeg is around
+                if filesize > MAX_FILE_SIZE and not use_ffmpeg:
                     raise Exception(FILE_TOO_LARGE_MESSAGE)
                 filename = ydl.prepare_filename(info)
-                res = ydl.download([url])
-                print("youtube-dl result :", res)
+                # Download from the resolved info instead of extracting the URL again
+                res = ydl.process_ie_result(dict(info), download=True)
+                print("youtube-dl result :", res.get("id") if isinstance(res, dict) else res)
                 
                 # If ffmpeg was used, expect .mp3 extension
                 if use_ffmpeg:
@@ -116,6 +262,11 @@ def download_video_audio(url, external_logger=lambda x: None):
                 
         except Exception as e:
             error_msg = str(e)
+            # Stream URLs in a cached info dict may have expired; resolve afresh next time
+            if from_cache:
+                invalidate_video_info(extract_video_id(url))
+                info = None
+                from_cache = False
             # If ffmpeg error and we haven't tried without it yet, retry without ffmpeg
             if "ffmpeg" in error_msg.lower() or "ffprobe" in error_msg.lower():
                 if retries == 0 and ffmpeg_available:
@@ -158,4 +309,157 @@ def delete_download(path):
         print(f"File or directory not found: {path}")
     except Exception as e:
         print(f"An error occurred while trying to delete {path}: {str(e)}")
-        
\ No newline at end of file
+        
+
+
+def _select_stream_format(info):
+    """Pick the direct media URL and headers yt-dlp resolved for the audio stream."""
+    formats = info.get("requested_formats") or [info]
+    for fmt in formats:
+        if fmt.get("url") and fmt.get("acodec") not in (None, "none"):
+            return fmt
+    return formats[0]
+
+
+def _pad_segment(previous, current, following, overlap, work_dir):
+    """
+    Build one overlapping chunk from the tail of `previous`, all of `current` and the
+    head of `following`, each a (path, start, end) tuple or None.
+    Returns (path, start, end) of the padded chunk; the unpadded segment if ffmpeg fails.
+    """
+    if overlap <= 0 or (previous is None and following is None):
+        return current
+    path, start, end = current
+    lines = ["ffconcat version 1.0"]
+    if previous is not None:
+        head = min(overlap, previous[2] - previous[1])
+        lines += [f"file '{os.path.abspath(previous[0])}'", f"inpoint {previous[2] - previous[1] - head:.3f}"]
+        start -= head
+    lines.append(f"file '{os.path.abspath(path)}'")
+    if following is not None:
+        tail = min(overlap, following[2] - following[1])
+        lines += [f"file '{os.path.abspath(following[0])}'", f"outpoint {tail:.3f}"]
+        end += tail
+    encoding_args, extension = get_speech_encoding()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    list_path = os.path.join(work_dir, f"{stem}.ffconcat")
+    padded_path = os.path.join(work_dir, f"{stem}_padded{extension}")
+    try:
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+            + encoding_args + [padded_path],
+            check=True, capture_output=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Could not pad segment {path}, using it without overlap: {e}")
+        return current
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+    return padded_path, start, end
+
+
+def _overlapping_segments(segments, work_dir, overlap):
+    """
+    Turn consecutive (path, start, end) segments into overlapping chunks.
+    Each chunk is emitted once the following segment exists, so one segment of look-ahead.
+    Yields (path, start, end, cut_start, cut_end): the padded audio with its global times,
+    and the range of the original segment that the chunk is responsible for.
+    Raw segments are deleted once both of their neighbours have been built.
+    """
+    previous = current = None
+    for following in segments:
+        if current is not None:
+            path, start, end = _pad_segment(previous, current, following, overlap, work_dir)
+            yield path, start, end, current[1], current[2]
+            if previous is not None and os.path.exists(previous[0]):
+                delete_download(previous[0])
+        previous, current = current, following
+    if current is not None:
+        path, start, end = _pad_segment(previous, current, None, overlap, work_dir)
+        yield path, start, end, current[1], current[2]
+    for leftover in (previous, current):
+        if leftover is not None and os.path.exists(leftover[0]):
+            delete_download(leftover[0])
+
+
+def segment_audio(source, work_dir, external_logger=lambda x: None, segment_seconds=STREAM_SEGMENT_SECONDS,
+                  headers="", copy_path=None, overlap=STREAM_SEGMENT_OVERLAP):
+    """
+    Re-encode `source` (a URL or a local file) through ffmpeg into fixed-length
+    speech-quality segments, optionally writing one full copy to `copy_path` in the same pass.
+    Neighbouring segments are padded with `overlap` seconds of each other's audio.
+    Yields (segment_path, start, end, cut_start, cut_end) as soon as each segment and
+    the one after it are complete; see _overlapping_segments().
+    The caller owns `work_dir` and removes it once the segments have been used.
+    """
+    yield from _overlapping_segments(
+        _fixed_segments(source, work_dir, external_logger, segment_seconds, headers, copy_path),
+        work_dir, overlap,
+    )
+
+
+def _fixed_segments(source, work_dir, external_logger, segment_seconds, headers, copy_path):
+    """Run the ffmpeg segmenter and yield (segment_path, start, end) as each segment is complete."""
+    encoding_args, extension = get_speech_encoding()
+    segment_list = os.path.join(work_dir, "segments.csv")
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    if headers:
+        command += ["-headers", headers]
+    command += ["-i", source] + encoding_args + [
+        "-f", "segment",
+        "-segment_time", str(segment_seconds),
+        "-reset_timestamps", "1",
+        "-segment_list", segment_list,
+        "-segment_list_type", "csv",
+        os.path.join(work_dir, f"segment_%04d{extension}"),
+    ]
+    if copy_path:
+        command += encoding_args + [copy_path]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    consumed = 0
+    try:
+        while True:
+            finished = process.poll() is not None
+            if os.path.exists(segment_list):
+                with open(segment_list, "r", encoding="utf-8") as f:
+                    lines = f.read().split("\n")
+                # The last element is either empty or a line ffmpeg is still writing
+                for line in lines[consumed:-1]:
+                    name, start, end = line.rsplit(",", 2)
+                    external_logger(f"Audio segment ready: {float(start):.0f}s - {float(end):.0f}s")
+                    yield os.path.join(work_dir, name), float(start), float(end)
+                consumed = max(consumed, len(lines) - 1)
+            if finished:
+                break
+            time.sleep(STREAM_POLL_INTERVAL)
+
+        if process.returncode != 0:
+            error_output = process.stderr.read().decode("utf-8", errors="ignore")
+            raise Exception(f"Streaming download failed: {error_output.strip() or process.returncode}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def stream_audio_segments(url, work_dir, external_logger=lambda x: None, segment_seconds=STREAM_SEGMENT_SECONDS,
+                          copy_path=None):
+    """
+    Download YouTube audio straight through ffmpeg, cutting it into overlapping
+    speech-quality segments while the download is still running.
+    See segment_audio() for what is yielded.
+    """
+    ydl_opts = get_ydl_opts(external_logger, use_ffmpeg=False)
+    ydl_opts["format"] = "bestaudio/best"
+    with youtube_dl.YoutubeDL(ydl_opts) as ydl:
+        print("Going to stream ", url)
+        info, _ = resolve_video_info(ydl, url)
+
+    stream = _select_stream_format(info)
+    headers = "".join(f"{key}: {value}\r\n" for key, value in (stream.get("http_headers") or {}).items())
+    yield from segment_audio(stream["url"], work_dir, external_logger, segment_seconds,
+                             headers=headers, copy_path=copy_path)
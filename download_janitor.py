@@ -0,0 +1,104 @@
+"""
+Download Janitor module for EchoMind
+Background thread that keeps ./downloads/audio under a byte quota, removes
+orphaned and partial files left behind by failed or abandoned downloads, and
+keeps the ./downloads/info video metadata cache under its own limit.
+"""
+import os
+import threading
+import time
+
+from download import DOWNLOAD_DIR, delete_download, enforce_info_cache_limit
+from audio_cache import AUDIO_CACHE_DIR, enforce_cache_quota
+
+DOWNLOAD_QUOTA_BYTES = int(os.environ.get("DOWNLOAD_QUOTA_BYTES", 3 * 1024 * 1024 * 1024))
+STALE_FILE_SECONDS = int(os.environ.get("STALE_FILE_SECONDS", 6 * 60 * 60))
+JANITOR_INTERVAL_SECONDS = int(os.environ.get("JANITOR_INTERVAL_SECONDS", 10 * 60))
+
+_janitor_lock = threading.Lock()
+_janitor_thread = None
+
+
+def _is_partial(name):
+    return name.endswith((".part", ".ytdl")) or ".partial." in name or ".part-Frag" in name
+
+
+def _cache_owned_files():
+    """Files in the cache directory that belong to a registered cache entry."""
+    owned = set()
+    for name in os.listdir(AUDIO_CACHE_DIR):
+        if name.endswith(".json"):
+            owned.add(name)
+            owned.add(name[:-len(".json")])
+    return owned
+
+
+def get_download_usage():
+    """Report bytes and file counts for the downloads directory."""
+    usage = {"total_bytes": 0, "cache_bytes": 0, "file_count": 0, "partial_files": 0, "quota_bytes": DOWNLOAD_QUOTA_BYTES}
+    for root, _, files in os.walk(DOWNLOAD_DIR):
+        for name in files:
+            try:
+                size = os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+            usage["total_bytes"] += size
+            usage["file_count"] += 1
+            if _is_partial(name):
+                usage["partial_files"] += 1
+            if os.path.abspath(root) == os.path.abspath(AUDIO_CACHE_DIR):
+                usage["cache_bytes"] += size
+    return usage
+
+
+def clean_downloads(max_age=STALE_FILE_SECONDS, quota=DOWNLOAD_QUOTA_BYTES):
+    """
+    Remove partial files and orphaned downloads older than `max_age` seconds,
+    then evict cached audio until the whole directory fits in `quota`.
+    Returns the usage report after cleaning.
+    """
+    now = time.time()
+    owned = _cache_owned_files()
+    for root, _, files in os.walk(DOWNLOAD_DIR):
+        in_cache = os.path.abspath(root) == os.path.abspath(AUDIO_CACHE_DIR)
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                age = now - os.path.getmtime(path)
+            except OSError:
+                continue
+            if age < max_age:
+                continue
+            if in_cache and not _is_partial(name) and os.path.splitext(name)[0] in owned:
+                continue
+            print(f"Janitor removing stale file {path}")
+            delete_download(path)
+
+    enforce_info_cache_limit()
+
+    usage = get_download_usage()
+    other_bytes = usage["total_bytes"] - usage["cache_bytes"]
+    if usage["total_bytes"] > quota:
+        enforce_cache_quota(max_bytes=max(quota - other_bytes, 0))
+        usage = get_download_usage()
+    return usage
+
+
+def _janitor_loop(interval):
+    while True:
+        try:
+            usage = clean_downloads()
+            print(f"Janitor: {usage['total_bytes'] / 1024 / 1024:.1f} MB in {usage['file_count']} file(s) under {DOWNLOAD_DIR}")
+        except Exception as e:
+            print(f"Janitor run failed: {e}")
+        time.sleep(interval)
+
+
+def start_janitor(interval=JANITOR_INTERVAL_SECONDS):
+    """Start the background janitor once per process."""
+    global _janitor_thread
+    with _janitor_lock:
+        if _janitor_thread is None or not _janitor_thread.is_alive():
+            _janitor_thread = threading.Thread(target=_janitor_loop, args=(interval,), name="download-janitor", daemon=True)
+            _janitor_thread.start()
+    return _janitor_thread
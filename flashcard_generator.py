@@ -2,11 +2,13 @@
 import json
 import streamlit as st
 
+from token_budget import fit_text
+
 
 def generate_flashcards(notes_content: str, groq_client, num_cards: int = 10,
                        model: str = "llama-3.3-70b-versatile") -> list:
     try:
-        limited = notes_content[:6000]
+        limited = fit_text(notes_content, model, 4000, limit=1500)
         prompt = f"""Based on the following notes, generate exactly {num_cards} study flashcards.
 
 Notes Content:
@@ -37,8 +39,9 @@ Respond in JSON format:
         result = json.loads(completion.choices[0].message.content)
         return result.get("flashcards", [])
     except Exception as e:
-        st.error(f"Flashcard generation failed: {str(e)}")
-        return []
+        # May run on a pipeline worker thread without a Streamlit context; callers report the error
+        print(f"Flashcard generation failed: {str(e)}")
+        raise
 
 
 def render_flashcards(flashcards: list):
@@ -0,0 +1,204 @@
+"""
+Live Transcription module for EchoMind
+Transcribes a microphone recording in rolling windows while it is still being
+captured, so a running transcript is available as soon as the speaker stops.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_processing import AUDIO_SAMPLE_RATE, cleanup_files
+from transcription import transcribe_chunk, stitch_transcripts, MAX_TRANSCRIBE_WORKERS
+from voice_activity import FRAME_SECONDS, detect_speech_spans
+
+# NumPy is needed to buffer and cut raw audio frames
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Browser microphone capture needs streamlit-webrtc (in requirements.txt); without it live mode is hidden
+try:
+    from streamlit_webrtc import webrtc_streamer, WebRtcMode
+    WEBRTC_AVAILABLE = NUMPY_AVAILABLE
+except ImportError:
+    webrtc_streamer = None
+    WebRtcMode = None
+    WEBRTC_AVAILABLE = False
+
+LIVE_WINDOW_SECONDS = float(os.environ.get("LIVE_WINDOW_SECONDS", 30))
+# Windows are cut at the quietest frame in this many seconds before the window end
+LIVE_CUT_SEARCH_SECONDS = 5.0
+
+
+def audio_frame_to_samples(frame):
+    """Convert an av.AudioFrame from the browser to (mono float32 samples, sample_rate)."""
+    data = frame.to_ndarray()
+    channels = len(frame.layout.channels)
+    if data.dtype == np.int16:
+        data = data.astype(np.float32) / 32768.0
+    else:
+        data = data.astype(np.float32)
+    # Packed formats interleave channels in a single row; planar ones use a row per channel
+    samples = data.reshape(-1, channels).mean(axis=1) if data.shape[0] == 1 else data.mean(axis=0)
+    return samples, frame.sample_rate
+
+
+def _write_wav(samples, path):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(AUDIO_SAMPLE_RATE)
+        f.writeframes(pcm.tobytes())
+    return path
+
+
+class LiveTranscriber:
+    """
+    Buffers incoming audio and transcribes it window by window on a worker pool.
+    `add_audio()` may be called from the capture thread; `transcript` and
+    `finish()` from the Streamlit script.
+    """
+    def __init__(self, groq_client, language="auto", window_seconds=LIVE_WINDOW_SECONDS,
+                 max_workers=MAX_TRANSCRIBE_WORKERS):
+        self.groq_client = groq_client
+        self.language = language
+        self.window_samples = int(window_seconds * AUDIO_SAMPLE_RATE)
+        self.work_dir = tempfile.mkdtemp(prefix="echomind_live_")
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.buffered_samples = 0
+        self.buffer_start = 0.0
+        self.chunks = []
+        self.futures = []
+        self.discarded = False
+
+    @property
+    def duration(self):
+        """Seconds of audio received so far."""
+        with self.lock:
+            return self.buffer_start + self.buffered_samples / AUDIO_SAMPLE_RATE
+
+    def has_audio(self):
+        return self.duration > 0
+
+    def add_audio(self, samples, sample_rate=AUDIO_SAMPLE_RATE):
+        """Append mono float32 samples; full windows are sent off for transcription."""
+        samples = np.asarray(samples, dtype=np.float32)
+        if sample_rate != AUDIO_SAMPLE_RATE and len(samples):
+            target_length = int(len(samples) * AUDIO_SAMPLE_RATE / sample_rate)
+            samples = np.interp(
+                np.linspace(0, len(samples) - 1, target_length), np.arange(len(samples)), samples
+            ).astype(np.float32)
+        with self.lock:
+            if self.discarded:
+                return
+            self.buffer.append(samples)
+            self.buffered_samples += len(samples)
+            if self.buffered_samples >= self.window_samples:
+                self._cut_window(final=False)
+
+    def _quietest_cut(self, samples):
+        """Sample index of the lowest-energy frame near the end of the window."""
+        frame_length = int(AUDIO_SAMPLE_RATE * FRAME_SECONDS)
+        search_start = max(len(samples) - int(LIVE_CUT_SEARCH_SECONDS * AUDIO_SAMPLE_RATE), 0)
+        frame_count = (len(samples) - search_start) // frame_length
+        if frame_count == 0:
+            return len(samples)
+        frames = samples[search_start:search_start + frame_count * frame_length].reshape(frame_count, frame_length)
+        quietest = int(np.argmin(np.mean(frames ** 2, axis=1)))
+        return search_start + quietest * frame_length + frame_length // 2
+
+    def _cut_window(self, final):
+        """Transcribe the buffered audio up to a quiet point (or all of it when final). Caller holds the lock."""
+        samples = np.concatenate(self.buffer) if self.buffer else np.zeros(0, dtype=np.float32)
+        cut = len(samples) if final else self._quietest_cut(samples)
+        window, rest = samples[:cut], samples[cut:]
+        start = self.buffer_start
+        end = start + len(window) / AUDIO_SAMPLE_RATE
+        self.buffer = [rest] if len(rest) else []
+        self.buffered_samples = len(rest)
+        self.buffer_start = end
+
+        # Windows without speech are never uploaded
+        if not len(window) or not detect_speech_spans(window):
+            return
+        index = len(self.chunks)
+        path = _write_wav(window, os.path.join(self.work_dir, f"live_{index:04d}.wav"))
+        self.chunks.append({"index": index, "start": start, "end": end, "cut_start": start, "cut_end": end})
+        self.futures.append(self.executor.submit(self._transcribe, path))
+
+    def _transcribe(self, path):
+        try:
+            return transcribe_chunk(self.groq_client, path, self.language)
+        finally:
+            cleanup_files([path])
+
+    @property
+    def transcript(self):
+        """Running transcript of the windows finished so far, in order."""
+        with self.lock:
+            chunks, futures = list(self.chunks), list(self.futures)
+        done = []
+        for future in futures:
+            if not future.done() or future.exception() is not None:
+                break
+            done.append(future.result())
+        return stitch_transcripts(chunks[:len(done)], done)["text"]
+
+    def finish(self):
+        """
+        Transcribe whatever is still buffered, wait for all windows and return
+        {"text": str, "segments": list} with times from the start of the recording.
+        """
+        with self.lock:
+            if self.buffered_samples:
+                self._cut_window(final=True)
+            chunks, futures = list(self.chunks), list(self.futures)
+        try:
+            results = [future.result() for future in futures]
+        finally:
+            self.executor.shutdown(wait=False)
+            try:
+                os.rmdir(self.work_dir)
+            except OSError:
+                pass
+        return stitch_transcripts(chunks, results)
+
+
+    def discard(self):
+        """Drop the recording: cancel pending windows, stop the pool and remove the temporary files."""
+        with self.lock:
+            self.discarded = True
+            self.buffer = []
+            self.buffered_samples = 0
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()
+        self.executor.shutdown(wait=False)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def start_live_capture(transcriber, key="live_webrtc"):
+    """Show the browser microphone widget and feed its audio into `transcriber`."""
+    def on_audio_frame(frame):
+        try:
+            samples, sample_rate = audio_frame_to_samples(frame)
+            transcriber.add_audio(samples, sample_rate)
+        except Exception as e:
+            print(f"Live audio frame dropped: {e}")
+        return frame
+
+    return webrtc_streamer(
+        key=key,
+        mode=WebRtcMode.SENDONLY,
+        media_stream_constraints={"audio": True, "video": False},
+        audio_frame_callback=on_audio_frame,
+    )
@@ -0,0 +1,183 @@
+"""
+LLM Cache module for EchoMind
+Persistent SQLite cache for non-streaming chat completions, keyed by model,
+prompt and sampling parameters, with a TTL, LRU size eviction and hit/miss
+counters. Wraps a Groq client so every generator benefits without changes.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 60 * 60))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 20 * 1024 * 1024))
+
+
+def _to_namespace(value):
+    """Rebuild attribute access (completion.choices[0].message.content) from stored JSON."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+def _to_dict(completion):
+    if hasattr(completion, "model_dump"):
+        return completion.model_dump()
+    if isinstance(completion, (SimpleNamespace, list)):
+        return _from_namespace(completion)
+    return completion.to_dict()
+
+
+def _from_namespace(value):
+    """Inverse of _to_namespace, for responses from providers that return plain namespaces."""
+    if isinstance(value, SimpleNamespace):
+        return {key: _from_namespace(item) for key, item in vars(value).items()}
+    if isinstance(value, list):
+        return [_from_namespace(item) for item in value]
+    return value
+
+
+def request_key(kwargs):
+    """Hash of the model, messages and every sampling parameter of a request."""
+    payload = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def init_llm_cache(db_path):
+    """Create the llm_cache table if needed"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            request_hash TEXT PRIMARY KEY,
+            model TEXT,
+            response TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_accessed REAL NOT NULL
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+
+class LLMCache:
+    """SQLite-backed store of serialized completions."""
+    def __init__(self, db_path, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()
+        init_llm_cache(db_path)
+
+    def _count(self, hit):
+        with self.counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Return the stored response dict for `key`, or None if missing or expired."""
+        try:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            c = conn.cursor()
+            c.execute('SELECT response, created_at FROM llm_cache WHERE request_hash = ?', (key,))
+            row = c.fetchone()
+            if row and time.time() - row[1] > self.ttl:
+                c.execute('DELETE FROM llm_cache WHERE request_hash = ?', (key,))
+                row = None
+            elif row:
+                c.execute('UPDATE llm_cache SET last_accessed = ? WHERE request_hash = ?', (time.time(), key))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error reading LLM cache: {e}")
+            row = None
+        self._count(row is not None)
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, model, response):
+        """Store a response and evict expired, then least recently used, entries beyond the size limit."""
+        try:
+            data = json.dumps(response, ensure_ascii=False, default=str)
+            now = time.time()
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            c = conn.cursor()
+            c.execute('''
+                INSERT OR REPLACE INTO llm_cache (request_hash, model, response, size_bytes, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (key, model, data, len(data.encode('utf-8')), now, now))
+            c.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl,))
+            c.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM llm_cache')
+            total = c.fetchone()[0]
+            if total > self.max_bytes:
+                c.execute('SELECT request_hash, size_bytes FROM llm_cache ORDER BY last_accessed ASC')
+                for request_hash, size in c.fetchall():
+                    if total <= self.max_bytes or request_hash == key:
+                        break
+                    c.execute('DELETE FROM llm_cache WHERE request_hash = ?', (request_hash,))
+                    total -= size
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error writing LLM cache: {e}")
+
+    def stats(self):
+        with self.counter_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache):
+        self._completions = completions
+        self._cache = cache
+
+    def create(self, **kwargs):
+        # Streams are consumed token by token and are never cached
+        if kwargs.get("stream") or not LLM_CACHE_ENABLED:
+            return self._completions.create(**kwargs)
+        key = request_key(kwargs)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return _to_namespace(cached)
+        completion = self._completions.create(**kwargs)
+        try:
+            self._cache.put(key, kwargs.get("model"), _to_dict(completion))
+        except Exception as e:
+            print(f"Could not cache completion: {e}")
+        return completion
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class _CachedChat:
+    def __init__(self, chat, cache):
+        self._chat = chat
+        self.completions = _CachedCompletions(chat.completions, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class CachedClient:
+    """
+    Drop-in wrapper around a Groq client: `chat.completions.create` answers repeated
+    non-streaming requests from the cache, everything else goes to the wrapped client.
+    """
+    def __init__(self, client, db_path, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES):
+        self._client = client
+        self.cache = LLMCache(db_path, ttl, max_bytes)
+        self.chat = _CachedChat(client.chat, self.cache)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -4,8 +4,31 @@ import json
 import os
 from io import BytesIO
 from dotenv import load_dotenv
-from download import download_video_audio, delete_download, MAX_FILE_SIZE, FILE_TOO_LARGE_MESSAGE
+from download import delete_download, extract_video_id, MAX_FILE_SIZE, FILE_TOO_LARGE_MESSAGE
+from audio_cache import cached_download, cached_audio_segments
+from youtube_captions import get_youtube_fast_path
+from media_probe import probe_file, probe_youtube, plan_media
+from download_janitor import start_janitor, get_download_usage
+from transcript_store import build_transcript_store, load_transcript_store
+from transcript_cleanup import clean_transcript
+from live_transcription import LiveTranscriber, start_live_capture, WEBRTC_AVAILABLE
+from section_engine import flatten_section_jobs, run_sections_concurrently, SECTION_CONCURRENCY
+from transcript_retrieval import build_transcript_index, window_word_ranges
+from notes_digest import CoveredDigest
+from llm_cache import CachedClient
+from pipeline import Stage, Pipeline
+from token_budget import fit_text, plan_prompt, estimate_tokens, input_budget
+from section_budget import SectionBudget, SECTION_MAX_OUTPUT_TOKENS
+from rate_limiter import RateLimitedClient
+from providers import build_provider_client
+from transcription import can_chunk_audio, transcribe_long_audio, transcribe_segment_stream, _segment_value
+from audio_processing import normalize_audio
+from voice_activity import trim_silence
 import base64
+import hashlib
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import time
 import sqlite3
 from datetime import datetime
@@ -91,9 +114,17 @@ uploaded_filename = None
 if 'api_key' not in st.session_state:
     st.session_state.api_key = GROQ_API_KEY
 
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 if 'groq' not in st.session_state:
     if GROQ_API_KEY:
-        st.session_state.groq = Groq()
+        # Retries are handled by the shared rate limiter, which coordinates all sessions;
+        # a second provider (Gemini, if configured) takes over on failures and slow responses
+        st.session_state.groq = build_provider_client(
+            RateLimitedClient(Groq(max_retries=0), session=st.session_state.session_id),
+            gemini_api_key=GEMINI_API_KEY,
+        )
 
 st.set_page_config(
     page_title="EchoMind",
@@ -246,16 +277,20 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Upper bound on cached transcript text kept in the database
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPT_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
 # Set Llama 4 models as constants
 OUTLINE_MODEL = "llama-3.3-70b-versatile"
 CONTENT_MODEL = "llama-3.3-70b-versatile"
       
 class GenerationStatistics:
-    def __init__(self, input_time=0,output_time=0,input_tokens=0,output_tokens=0,total_time=0,model_name="meta-llama/llama-4-scout-17b-16e-instruct"):
+    def __init__(self, input_time=0,output_time=0,input_tokens=0,output_tokens=0,total_time=0,model_name="meta-llama/llama-4-scout-17b-16e-instruct",cached_tokens=0):
         self.input_time = input_time
         self.output_time = output_time
         self.input_tokens = input_tokens
         self.output_tokens = output_tokens
+        self.cached_tokens = cached_tokens # Prompt tokens served from the provider's prompt cache
         self.total_time = total_time # Sum of queue, prompt (input), and completion (output) times
         self.model_name = model_name
 
@@ -288,6 +323,7 @@ class GenerationStatistics:
         self.output_time += other.output_time
         self.input_tokens += other.input_tokens
         self.output_tokens += other.output_tokens
+        self.cached_tokens += other.cached_tokens
         self.total_time += other.total_time
 
     def __str__(self):
@@ -296,7 +332,15 @@ class GenerationStatistics:
                 f"|-----------------|----------------|-----------------|----------------|\n"
                 f"| Speed (T/s)     | {self.get_input_speed():.2f}            | {self.get_output_speed():.2f}            | {(self.input_tokens + self.output_tokens) / self.total_time if self.total_time != 0 else 0:.2f}            |\n"
                 f"| Tokens          | {self.input_tokens}            | {self.output_tokens}            | {self.input_tokens + self.output_tokens}            |\n"
-                f"| Inference Time (s) | {self.input_time:.2f}            | {self.output_time:.2f}            | {self.total_time:.2f}            |")
+                f"| Inference Time (s) | {self.input_time:.2f}            | {self.output_time:.2f}            | {self.total_time:.2f}            |\n"
+                f"| Cached / Uncached | {self.cached_tokens} / {self.input_tokens - self.cached_tokens}            | -            | -            |")
+
+def cached_prompt_tokens(usage):
+    """Prompt tokens the provider reports as served from its prompt cache (0 when not reported)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", None) or 0
 
 class NoteSection:
     def __init__(self, structure, transcript, speaker_info=None):
@@ -416,15 +460,6 @@ class NoteSection:
                 enhanced_lines.append(line)
         return '\n'.join(enhanced_lines)
 
-    def return_existing_contents(self, level=1) -> str:
-        existing_content = ""
-        for title, content in self.structure.items():
-            if self.contents[title].strip():  # Only include title if there is content
-                existing_content += f"{'#' * level} {title}\n{self.contents[title]}.\n\n"
-            if isinstance(content, dict):
-                existing_content += self.get_markdown_content(content, level + 1)
-        return existing_content
-
     def display_structure(self, structure=None, level=1):
         if structure is None:
             structure = self.structure
@@ -841,14 +876,14 @@ def _create_pdf_with_fpdf(content: str, filename: str = "generated_notes", flowc
     buf.seek(0)
     return buf
 
-def extract_topics_and_relationships(notes_content: str, model: str = "llama-3.3-70b-versatile"):
+def extract_topics_and_relationships(notes_content: str, model: str = "llama-3.3-70b-versatile", groq_client=None):
     """
     Extract topics and their relationships from notes content using LLM.
     Categorizes topics for professional flowchart representation.
     """
     try:
         # Limit content to avoid token limits
-        limited_content = notes_content[:8000]
+        limited_content = fit_text(notes_content, model, 4000, limit=2000)
         prompt = f"""Analyze the following notes and extract a structured flowchart data.
 Each topic must be categorized appropriately to create a logical process flow:
 - Categorize as 'start' for the beginning of the process.
@@ -880,7 +915,8 @@ Provide your response in JSON format:
 
 Ensure the relationships create a clean, hierarchical flow from START to END."""
 
-        completion = st.session_state.groq.chat.completions.create(
+        groq_client = groq_client or st.session_state.groq
+        completion = groq_client.chat.completions.create(
             model=model,
             messages=[
                 {
@@ -903,8 +939,10 @@ Ensure the relationships create a clean, hierarchical flow from START to END."""
         result = json.loads(completion.choices[0].message.content)
         return result
     except Exception as e:
-        st.error(f"Error extracting topics: {str(e)}")
-        return {"topics": [], "relationships": []}
+        # May run on a pipeline worker thread, where Streamlit elements are unavailable;
+        # the caller reports the error on the script thread
+        print(f"Error extracting topics: {str(e)}")
+        raise
 
 def generate_mermaid_flowchart(topics_data: dict):
     """
@@ -1020,12 +1058,62 @@ def get_notes_text_for_tts():
 def transcribe_audio(audio_file, language="en"):
     """
     Transcribes audio using Groq's Whisper API with language support.
+    The input is probed first: oversized files are rejected, long recordings are
+    split at silences and transcribed in parallel, and bulky encodings are shrunk.
+    Returns {"text": str, "segments": [{"start", "end", "text"}]} with times in the original audio.
     """
+    audio_file.seek(0)
+    suffix = os.path.splitext(getattr(audio_file, "name", "") or "")[1] or ".wav"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(audio_file.read())
+        tmp_path = tmp.name
+    try:
+        media_plan = plan_media(probe_file(tmp_path), can_process=can_chunk_audio())
+    except Exception:
+        delete_download(tmp_path)
+        raise
+    if media_plan["action"] == "reject" or not can_chunk_audio():
+        delete_download(tmp_path)
+    if media_plan["action"] == "reject":
+        raise ValueError(media_plan["reason"])
+
+    time_map = None
+    if can_chunk_audio():
+        speech_path = None
+        try:
+            if media_plan["action"] == "chunk":
+                return transcribe_long_audio(st.session_state.groq, tmp_path, language=language)
+            # Shrink the payload to 16 kHz mono speech audio before it is uploaded
+            if media_plan["action"] == "transcode":
+                try:
+                    speech_path = normalize_audio(tmp_path)
+                except Exception as e:
+                    print(f"Audio normalization failed, sending original audio: {e}")
+                    speech_path = None
+            source_path = speech_path or tmp_path
+            # Drop long pauses so we don't pay to upload and transcribe silence
+            try:
+                voiced_path, time_map = trim_silence(source_path)
+            except Exception as e:
+                print(f"Voice activity trimming failed, sending untrimmed audio: {e}")
+                voiced_path = source_path
+            if voiced_path != tmp_path:
+                with open(voiced_path, 'rb') as f:
+                    audio_file = BytesIO(f.read())
+                audio_file.name = os.path.basename(voiced_path)
+            if voiced_path not in (tmp_path, source_path):
+                delete_download(voiced_path)
+        finally:
+            delete_download(tmp_path)
+            if speech_path:
+                delete_download(speech_path)
+        audio_file.seek(0)
+
     kwargs = {
         "file": audio_file,
         "model": "whisper-large-v3",
         "prompt": "",
-        "response_format": "json",
+        "response_format": "verbose_json",
         "temperature": 0.0,
     }
     # Only set language if not auto-detect
@@ -1033,7 +1121,17 @@ def transcribe_audio(audio_file, language="en"):
         kwargs["language"] = language
     
     transcription = st.session_state.groq.audio.transcriptions.create(**kwargs)
-    return transcription.text
+    segments = [
+        {
+            "start": float(_segment_value(seg, "start", 0.0)),
+            "end": float(_segment_value(seg, "end", 0.0)),
+            "text": (_segment_value(seg, "text", "") or "").strip(),
+        }
+        for seg in (getattr(transcription, "segments", None) or [])
+    ]
+    if time_map is not None:
+        time_map.map_segments(segments)
+    return {"text": transcription.text, "segments": segments}
 
 def identify_speakers(transcript: str, model: str = "meta-llama/llama-4-scout-17b-16e-instruct"):
     """
@@ -1047,7 +1145,7 @@ def identify_speakers(transcript: str, model: str = "meta-llama/llama-4-scout-17
 3. Any brief information mentioned about each speaker (role, title, background, etc.)
 
 Transcript:
-{transcript[:5000]}
+{fit_text(transcript, model, 2000, limit=1250)}
 
 Provide your response in JSON format:
 {{
@@ -1107,13 +1205,12 @@ If no clear speaker identification is possible, estimate based on context, dialo
             "speaker_mentions": "Speaker identification could not be determined automatically."
         }
 
-def generate_notes_structure(transcript: str, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct", note_style: str = "detailed"):
-    """
-    Returns notes structure content as well as total tokens and total time for generation.
-    note_style: 'exam_ready', 'detailed', or 'with_examples'
-    """
+# The outline is a small JSON object; a smaller output reservation leaves more of the budget for the transcript
+OUTLINE_MAX_TOKENS = 3000
+# Merged outlines share that output limit, so each merge is asked for a bounded number of sections
+OUTLINE_MERGE_MAX_SECTIONS = 24
 
-    shot_example = """
+NOTES_STRUCTURE_EXAMPLE = """
 "Introduction": "Introduction to the AMA session, including the topic of Groq scaling architecture and the panelists",
 "Panelist Introductions": "Brief introductions from Igor, Andrew, and Omar, covering their backgrounds and roles at Groq",
 "Groq Scaling Architecture Overview": "High-level overview of Groq's scaling architecture, covering hardware, software, and cloud components",
@@ -1123,12 +1220,20 @@ def generate_notes_structure(transcript: str, model: str = "meta-llama/llama-4-m
 "Hardware Implementation": "Igor's explanation of the hardware implementation, including a comparison of GPU and LPU architectures"
 }"""
 
-    style_instructions = {
-        "exam_ready": "Create a CONCISE structure with fewer sections. Focus only on key concepts, definitions, and exam-relevant points. Keep section descriptions brief.",
-        "detailed": "Create a comprehensive structure. Section titles and content descriptions must be comprehensive. Quality over quantity.",
-        "with_examples": "Create a comprehensive structure with extra sections for real-world examples and analogies. Each major concept should have an example section."
-    }
-    style_instruction = style_instructions.get(note_style, style_instructions["detailed"])
+NOTES_STRUCTURE_STYLES = {
+    "exam_ready": "Create a CONCISE structure with fewer sections. Focus only on key concepts, definitions, and exam-relevant points. Keep section descriptions brief.",
+    "detailed": "Create a comprehensive structure. Section titles and content descriptions must be comprehensive. Quality over quantity.",
+    "with_examples": "Create a comprehensive structure with extra sections for real-world examples and analogies. Each major concept should have an example section."
+}
+
+def generate_notes_structure(transcript: str, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct", note_style: str = "detailed"):
+    """
+    Returns notes structure content as well as total tokens and total time for generation.
+    note_style: 'exam_ready', 'detailed', or 'with_examples'
+    """
+
+    style_instruction = NOTES_STRUCTURE_STYLES.get(note_style, NOTES_STRUCTURE_STYLES["detailed"])
+    transcript = fit_text(transcript, model, OUTLINE_MAX_TOKENS)
 
     completion = st.session_state.groq.chat.completions.create(
         model=model,
@@ -1139,11 +1244,11 @@ def generate_notes_structure(transcript: str, model: str = "meta-llama/llama-4-m
             },
             {
                 "role": "user",
-                "content": f"### Transcript {transcript}\n\n### Example\n\n{shot_example}### Instructions\n\n{style_instruction}\n\nCreate a structure for notes on the above transcribed audio."
+                "content": f"### Transcript {transcript}\n\n### Example\n\n{NOTES_STRUCTURE_EXAMPLE}### Instructions\n\n{style_instruction}\n\nCreate a structure for notes on the above transcribed audio."
             }
         ],
         temperature=0.3,
-        max_tokens=8000,
+        max_tokens=OUTLINE_MAX_TOKENS,
         top_p=1,
         stream=False,
         response_format={"type": "json_object"},
@@ -1151,47 +1256,327 @@ def generate_notes_structure(transcript: str, model: str = "meta-llama/llama-4-m
     )
 
     usage = completion.usage
-    statistics_to_return = GenerationStatistics(input_time=usage.prompt_time, output_time=usage.completion_time, input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens, total_time=usage.total_time, model_name=model)
+    statistics_to_return = GenerationStatistics(input_time=usage.prompt_time, output_time=usage.completion_time, input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens, total_time=usage.total_time, model_name=model, cached_tokens=cached_prompt_tokens(usage))
 
     return statistics_to_return, completion.choices[0].message.content
 
-def generate_section(transcript: str, existing_notes: str, section: str, model: str = "meta-llama/llama-4-scout-17b-16e-instruct", note_style: str = "detailed"):
-    style_prompts = {
-        "exam_ready": "You are an expert exam prep writer. Generate CONCISE, bullet-point notes. Use short sentences, key terms in bold, and focus on definitions, formulas, and exam-relevant facts. No fluff.",
-        "detailed": "You are an expert writer. Generate comprehensive note content for the section provided based factually on the transcript provided. Do *not* repeat any content from previous sections. Do *not* include the section title/header in your response - only generate the content.",
-        "with_examples": "You are an expert educator. Generate comprehensive notes AND include real-world examples, analogies, or case studies for each concept. Make concepts easy to understand with practical illustrations. Do *not* repeat any content from previous sections."
-    }
-    system_prompt = style_prompts.get(note_style, style_prompts["detailed"])
+def generate_partial_outline(window: str, part: int, part_count: int, model: str, note_style: str, groq_client):
+    """
+    Map step of the long-transcript outline: outline one window of the transcript.
+    Returns (statistics, {section title: description}).
+    """
+    style_instruction = NOTES_STRUCTURE_STYLES.get(note_style, NOTES_STRUCTURE_STYLES["detailed"])
+    completion = groq_client.chat.completions.create(
+        model=model,
+        messages=[
+            {
+                "role": "system",
+                "content": "Write in JSON format:\n\n{\"Title of section goes here\":\"Description of section goes here\",\"Title of section goes here\":\"Description of section goes here\"}"
+            },
+            {
+                "role": "user",
+                "content": f"### Transcript (part {part} of {part_count})\n\n{window}\n\n### Instructions\n\n{style_instruction}\n\nCreate a structure for notes on this part of the transcribed audio only."
+            }
+        ],
+        temperature=0.3,
+        max_tokens=OUTLINE_MAX_TOKENS,
+        top_p=1,
+        stream=False,
+        response_format={"type": "json_object"},
+        stop=None,
+    )
+    usage = completion.usage
+    statistics_to_return = GenerationStatistics(input_time=usage.prompt_time, output_time=usage.completion_time, input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens, total_time=usage.total_time, model_name=model, cached_tokens=cached_prompt_tokens(usage))
+    outline = json.loads(completion.choices[0].message.content)
+    return statistics_to_return, {title: description for title, description in outline.items() if isinstance(description, str)}
 
-    stream = st.session_state.groq.chat.completions.create(
+def render_outline_parts(outlines: list):
+    """
+    Outlines as merge input. Each outline is (structure, section_sources); the parts
+    named in the text are always window numbers, so merges of merges keep them.
+    """
+    blocks = []
+    for structure, section_sources in outlines:
+        windows = sorted({window for title in structure for window in section_sources.get(title, [])})
+        if len(windows) <= 1:
+            heading = f"### Part {windows[0] + 1}" if windows else "### Part"
+            lines = [f"- {title}: {description}" for title, description in structure.items()]
+        else:
+            heading = f"### Parts {windows[0] + 1}-{windows[-1] + 1}"
+            lines = [
+                f"- {title} (parts {', '.join(str(window + 1) for window in section_sources.get(title, []))}): {description}"
+                for title, description in structure.items()
+            ]
+        blocks.append(heading + "\n" + "\n".join(lines))
+    return "\n\n".join(blocks)
+
+def concatenate_outlines(outlines: list):
+    """Outlines that could not be merged, kept in order. Returns (structure, section_sources)."""
+    structure, section_sources = {}, {}
+    for index, (outline, sources) in enumerate(outlines):
+        for title, description in outline.items():
+            unique_title = title if title not in structure else f"{title} (part {index + 1})"
+            structure[unique_title] = description
+            section_sources[unique_title] = list(sources.get(title, []))
+    return structure, section_sources
+
+def merge_partial_outlines(outlines: list, window_count: int, model: str, note_style: str, groq_client):
+    """
+    Reduce step: merge outlines of consecutive parts into one outline.
+    `outlines` is a list of (structure, section_sources) as from render_outline_parts.
+    Returns (statistics, structure, section_sources) where section_sources maps each
+    section title to the indexes of the windows it was built from.
+    Raises ValueError when the merged outline is empty or was cut off.
+    """
+    style_instruction = NOTES_STRUCTURE_STYLES.get(note_style, NOTES_STRUCTURE_STYLES["detailed"])
+    parts_text = fit_text(render_outline_parts(outlines), model, OUTLINE_MAX_TOKENS)
+    completion = groq_client.chat.completions.create(
         model=model,
         messages=[
             {
                 "role": "system",
-                "content": system_prompt
+                "content": "Write in JSON format:\n\n{\"sections\": [{\"title\": \"Title of section\", \"description\": \"Description of section\", \"parts\": [<part numbers the section draws on>]}]}"
             },
             {
                 "role": "user",
-                "content": f"### Transcript\n\n{transcript}\n\n### Existing Notes\n\n{existing_notes}\n\n### Instructions\n\nGenerate note content (without the section title) for this section only based on the transcript: \n\n{section}"
+                "content": f"The outlines below were made for consecutive parts of one long transcript.\n\n{parts_text}\n\n### Instructions\n\nMerge them into a single outline of at most {OUTLINE_MERGE_MAX_SECTIONS} sections in the order the topics are covered. Combine sections that cover the same topic across parts and list every part each merged section draws on. {style_instruction}"
             }
         ],
         temperature=0.3,
-        max_tokens=8000,
+        max_tokens=OUTLINE_MAX_TOKENS,
         top_p=1,
-        stream=True,
+        stream=False,
+        response_format={"type": "json_object"},
         stop=None,
     )
+    usage = completion.usage
+    statistics_to_return = GenerationStatistics(input_time=usage.prompt_time, output_time=usage.completion_time, input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens, total_time=usage.total_time, model_name=model, cached_tokens=cached_prompt_tokens(usage))
+    if getattr(completion.choices[0], "finish_reason", None) == "length":
+        raise ValueError("Merged outline was cut off at the output limit")
+
+    structure, section_sources = {}, {}
+    for section in json.loads(completion.choices[0].message.content).get("sections", []):
+        title, description = section.get("title"), section.get("description")
+        if not isinstance(title, str) or not isinstance(description, str) or title in structure:
+            continue
+        parts = sorted({int(p) - 1 for p in section.get("parts") or [] if str(p).isdigit() and 0 < int(p) <= window_count})
+        structure[title] = description
+        section_sources[title] = parts
+    if not structure:
+        raise ValueError("Merged outline is empty")
+    return statistics_to_return, structure, section_sources
+
+def group_outlines(outlines: list, budget: int):
+    """Consecutive groups of at least two outlines whose merge input fits in `budget` tokens."""
+    groups, current = [], []
+    for outline in outlines:
+        if len(current) >= 2 and estimate_tokens(render_outline_parts(current + [outline])) > budget:
+            groups.append(current)
+            current = []
+        current.append(outline)
+    if len(current) == 1 and groups:
+        groups[-1].append(current[0])
+    elif current:
+        groups.append(current)
+    return groups
+
+def reduce_outlines(outlines: list, window_count: int, model: str, note_style: str, groq_client):
+    """
+    Merge outlines in stages so every merge prompt fits the model's input budget:
+    consecutive groups are merged first and the results merged again. A merge that
+    fails or is cut off is retried on each half, and the halves are kept in order.
+    Returns (statistics, structure, section_sources).
+    """
+    statistics = GenerationStatistics(model_name=model)
+    if len(outlines) == 1:
+        return statistics, dict(outlines[0][0]), dict(outlines[0][1])
+
+    budget = input_budget(model, OUTLINE_MAX_TOKENS)
+    groups = group_outlines(outlines, budget) if estimate_tokens(render_outline_parts(outlines)) > budget else [outlines]
+    if len(groups) > 1:
+        with ThreadPoolExecutor(max_workers=max(1, min(SECTION_CONCURRENCY, len(groups)))) as executor:
+            merged = list(executor.map(lambda group: reduce_outlines(group, window_count, model, note_style, groq_client), groups))
+        for group_statistics, _, _ in merged:
+            statistics.add(group_statistics)
+        final_statistics, structure, section_sources = reduce_outlines([(structure, sources) for _, structure, sources in merged], window_count, model, note_style, groq_client)
+        statistics.add(final_statistics)
+        return statistics, structure, section_sources
+
+    try:
+        merge_statistics, structure, section_sources = merge_partial_outlines(outlines, window_count, model, note_style, groq_client)
+        statistics.add(merge_statistics)
+        return statistics, structure, section_sources
+    except Exception as e:
+        print(f"Merge of {len(outlines)} outlines failed, merging each half instead: {e}")
+    middle = len(outlines) // 2
+    halves = []
+    for half in (outlines[:middle], outlines[middle:]):
+        half_statistics, structure, section_sources = reduce_outlines(half, window_count, model, note_style, groq_client)
+        statistics.add(half_statistics)
+        halves.append((structure, section_sources))
+    structure, section_sources = concatenate_outlines(halves)
+    return statistics, structure, section_sources
+
+def generate_notes_structure_map_reduce(windows: list, model: str = "llama-3.3-70b-versatile", note_style: str = "detailed"):
+    """
+    Outline a transcript too long for one prompt: outline each window in parallel,
+    then merge the partial outlines in stages that fit the model's budget.
+    Returns (statistics, structure JSON, section_sources).
+    """
+    groq_client = st.session_state.groq
+    statistics = GenerationStatistics(model_name=model)
+    with ThreadPoolExecutor(max_workers=max(1, min(SECTION_CONCURRENCY, len(windows)))) as executor:
+        partials = list(executor.map(
+            lambda item: generate_partial_outline(item[1], item[0] + 1, len(windows), model, note_style, groq_client),
+            enumerate(windows),
+        ))
+    partial_outlines = []
+    for index, (partial_statistics, outline) in enumerate(partials):
+        statistics.add(partial_statistics)
+        partial_outlines.append((outline, {title: [index] for title in outline}))
+
+    merge_statistics, structure, section_sources = reduce_outlines(partial_outlines, len(windows), model, note_style, groq_client)
+    statistics.add(merge_statistics)
+    return statistics, json.dumps(structure), section_sources
+
+def generate_preamble(transcript: str, model: str = "llama-3.3-70b-versatile", note_style: str = "detailed", include_structure: bool = True):
+    """
+    One structured call for the title, speaker information and (optionally) the notes structure.
+    Returns (statistics, title, speaker_info, notes_structure_json or None).
+    Raises ValueError if the response does not match the expected schema.
+    """
+    style_instruction = NOTES_STRUCTURE_STYLES.get(note_style, NOTES_STRUCTURE_STYLES["detailed"])
+    structure_schema = ',\n    "structure": {"Title of section goes here": "Description of section goes here", ...}' if include_structure else ""
+    transcript = fit_text(transcript, model, OUTLINE_MAX_TOKENS)
+    structure_instructions = f"\n\n### Structure\n\nThe \"structure\" object is the outline for notes on the transcript. {style_instruction}\n\nExample structure:\n{NOTES_STRUCTURE_EXAMPLE}" if include_structure else ""
+
+    completion = st.session_state.groq.chat.completions.create(
+        model=model,
+        messages=[
+            {
+                "role": "system",
+                "content": f"""You analyze transcripts. Write in JSON format:
+
+{{
+    "title": "<short, descriptive title of the main topic, 5-10 words>",
+    "speakers": {{
+        "speaker_count": <number>,
+        "speakers": [{{"identifier": "<name or Speaker 1, Speaker 2, etc.>", "role_or_title": "<if mentioned>", "brief_info": "<any information mentioned about this speaker>"}}],
+        "speaker_mentions": "<brief summary of how speakers are identified or mentioned>"
+    }}{structure_schema}
+}}
 
-    for chunk in stream:
-        tokens = chunk.choices[0].delta.content
-        if tokens:
-            yield tokens
-        if x_groq := chunk.x_groq:
-            if not x_groq.usage:
-                continue
-            usage = x_groq.usage
-            statistics_to_return = GenerationStatistics(input_time=usage.prompt_time, output_time=usage.completion_time, input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens, total_time=usage.total_time, model_name=model)
-            yield statistics_to_return
+If no clear speaker identification is possible, estimate based on context, dialogue patterns, and content changes."""
+            },
+            {
+                "role": "user",
+                "content": f"### Transcript {transcript}{structure_instructions}\n\n### Instructions\n\nReturn the title, speakers{' and structure' if include_structure else ''} for the above transcribed audio."
+            }
+        ],
+        temperature=0.3,
+        max_tokens=OUTLINE_MAX_TOKENS,
+        top_p=1,
+        stream=False,
+        response_format={"type": "json_object"},
+        stop=None,
+    )
+
+    usage = completion.usage
+    statistics_to_return = GenerationStatistics(input_time=usage.prompt_time, output_time=usage.completion_time, input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens, total_time=usage.total_time, model_name=model, cached_tokens=cached_prompt_tokens(usage))
+
+    data = json.loads(completion.choices[0].message.content)
+    title = data.get("title")
+    speaker_info = data.get("speakers")
+    structure = data.get("structure")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("Preamble response has no title")
+    if not isinstance(speaker_info, dict) or not isinstance(speaker_info.get("speakers"), list):
+        raise ValueError("Preamble response has no speaker information")
+    speaker_info["speaker_count"] = int(speaker_info.get("speaker_count") or len(speaker_info["speakers"]))
+    if include_structure:
+        if not isinstance(structure, dict) or not structure or not all(isinstance(v, (str, dict)) for v in structure.values()):
+            raise ValueError("Preamble response has no valid notes structure")
+        structure = json.dumps(structure)
+    else:
+        structure = None
+
+    return statistics_to_return, title.strip().strip('"').strip("'"), speaker_info, structure
+
+def build_section_messages(system_prompt: str, transcript: str, existing_notes: str, section: str):
+    """
+    Chat messages for one section. Everything that is the same for every section of
+    a job (system prompt, transcript, instructions) comes first and byte-identical,
+    so the provider can reuse the cached prefix; the covered digest and the section
+    that change per request come last.
+    """
+    return [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": f"### Transcript\n\n{transcript}\n\n### Instructions\n\nGenerate note content (without the section title) for the section given at the end, based only on the transcript. Do not repeat anything listed under Already Covered.\n\n### Already Covered (do not repeat)\n\n{existing_notes or 'Nothing yet.'}\n\n### Section\n\n{section}"
+        }
+    ]
+
+# A section that stops at its output allowance is continued up to this many times
+SECTION_MAX_CONTINUATIONS = int(os.environ.get("SECTION_MAX_CONTINUATIONS", 2))
+
+def generate_section(transcript: str, existing_notes: str, section: str, model: str = "meta-llama/llama-4-scout-17b-16e-instruct", note_style: str = "detailed", groq_client=None, max_tokens: int = 8000):
+    style_prompts = {
+        "exam_ready": "You are an expert exam prep writer. Generate CONCISE, bullet-point notes. Use short sentences, key terms in bold, and focus on definitions, formulas, and exam-relevant facts. No fluff.",
+        "detailed": "You are an expert writer. Generate comprehensive note content for the section provided based factually on the transcript provided. Do *not* repeat any content from previous sections. Do *not* include the section title/header in your response - only generate the content.",
+        "with_examples": "You are an expert educator. Generate comprehensive notes AND include real-world examples, analogies, or case studies for each concept. Make concepts easy to understand with practical illustrations. Do *not* repeat any content from previous sections."
+    }
+    system_prompt = style_prompts.get(note_style, style_prompts["detailed"])
+    # Worker threads have no Streamlit session, so the client can be passed in explicitly
+    groq_client = groq_client or st.session_state.groq
+
+    messages = build_section_messages(system_prompt, transcript, existing_notes, section)
+    statistics_to_return = None
+    written = ""
+    for continuation in range(SECTION_MAX_CONTINUATIONS + 1):
+        stream = groq_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            top_p=1,
+            stream=True,
+            stop=None,
+        )
+
+        finish_reason = None
+        for chunk in stream:
+            tokens = chunk.choices[0].delta.content
+            if tokens:
+                written += tokens
+                yield tokens
+            finish_reason = getattr(chunk.choices[0], "finish_reason", None) or finish_reason
+            if x_groq := chunk.x_groq:
+                if not x_groq.usage:
+                    continue
+                usage = x_groq.usage
+                call_statistics = GenerationStatistics(input_time=usage.prompt_time, output_time=usage.completion_time, input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens, total_time=usage.total_time, model_name=model, cached_tokens=cached_prompt_tokens(usage))
+                if statistics_to_return is None:
+                    statistics_to_return = call_statistics
+                else:
+                    statistics_to_return.add(call_statistics)
+
+        if finish_reason != "length" or continuation == SECTION_MAX_CONTINUATIONS:
+            break
+        # The section hit its output allowance mid-way; ask for the rest instead of leaving it cut off
+        print(f"Section stopped at its {max_tokens} token allowance, continuing it")
+        continued_transcript = fit_text(transcript, model, estimate_tokens(written) + max_tokens)
+        messages = build_section_messages(system_prompt, continued_transcript, existing_notes, section) + [
+            {"role": "assistant", "content": written},
+            {"role": "user", "content": "Your answer was cut off. Continue exactly where it stopped, without repeating anything already written."},
+        ]
+
+    # One statistics item per section, so output_tokens covers every continuation
+    if statistics_to_return is not None:
+        yield statistics_to_return
 
 def generate_title(transcript: str, model: str = "llama-3.3-70b-versatile"):
     """Generate a concise topic title from the transcript using the LLM."""
@@ -1205,7 +1590,7 @@ def generate_title(transcript: str, model: str = "llama-3.3-70b-versatile"):
                 },
                 {
                     "role": "user",
-                    "content": f"Generate a title for this transcript:\n\n{transcript[:3000]}"
+                    "content": f"Generate a title for this transcript:\n\n{fit_text(transcript, model, 30, limit=750)}"
                 }
             ],
             temperature=0.3,
@@ -1266,6 +1651,12 @@ def get_db_path():
                 db_path = os.path.basename(db_path)
     return db_path
 
+def add_column_if_missing(cursor, table, column, declaration):
+    """Add a column to an existing table (simple schema migration)"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
 def init_database():
     """Initialize the SQLite database for storing notes"""
     try:
@@ -1282,6 +1673,7 @@ def init_database():
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        add_column_if_missing(c, 'notes', 'segments', 'BLOB')
         conn.commit()
         conn.close()
         print(f"Database initialized successfully at: {db_path}")
@@ -1302,22 +1694,23 @@ def init_database():
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
+            add_column_if_missing(c, 'notes', 'segments', 'BLOB')
             conn.commit()
             conn.close()
             print(f"Database initialized with fallback path: {db_path}")
         except Exception as e2:
             print(f"Critical: Could not initialize database: {e2}")
 
-def save_note_to_db(title, filename, content):
-    """Save a note to the database"""
+def save_note_to_db(title, filename, content, segments_blob=None):
+    """Save a note (and its timestamped transcript segments, if any) to the database"""
     try:
         db_path = get_db_path()
         conn = sqlite3.connect(db_path, check_same_thread=False)
         c = conn.cursor()
         c.execute('''
-            INSERT INTO notes (title, filename, content, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, filename, content, datetime.now(), datetime.now()))
+            INSERT INTO notes (title, filename, content, segments, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (title, filename, content, segments_blob, datetime.now(), datetime.now()))
         conn.commit()
         note_id = c.lastrowid
         conn.close()
@@ -1352,7 +1745,7 @@ def get_note_by_id(note_id):
         conn = sqlite3.connect(db_path, check_same_thread=False)
         c = conn.cursor()
         c.execute('''
-            SELECT id, title, filename, content, created_at, updated_at
+            SELECT id, title, filename, content, created_at, updated_at, segments
             FROM notes
             WHERE id = ?
         ''', (note_id,))
@@ -1363,6 +1756,22 @@ def get_note_by_id(note_id):
         print(f"Error retrieving note {note_id} from database: {e}")
         return None
 
+def render_transcript_search(transcript_store, key):
+    """Let the reader look up when a phrase from the transcript was spoken"""
+    if transcript_store is None or not len(transcript_store):
+        return
+    with st.expander("🔎 Find in recording", expanded=False):
+        phrase = st.text_input("Phrase from the transcript", key=f"transcript_search_{key}")
+        if phrase:
+            seconds = transcript_store.find_time(phrase.strip(), ignore_case=True)
+            if seconds is None:
+                st.info("That phrase is not in the transcript.")
+            else:
+                minutes, secs = divmod(int(seconds), 60)
+                index = transcript_store.segment_at_time(seconds)
+                segment_text = transcript_store.text[transcript_store.char_offsets[index]:transcript_store.char_offsets[index] + transcript_store.lengths[index]]
+                st.markdown(f"**Spoken at {minutes // 60:d}:{minutes % 60:02d}:{secs:02d}**  \n{segment_text}")
+
 def delete_note_from_db(note_id):
     """Delete a note from the database"""
     try:
@@ -1377,13 +1786,113 @@ def delete_note_from_db(note_id):
         print(f"Error deleting note {note_id} from database: {e}")
         return False
 
+def init_transcript_cache():
+    """Initialize the transcript cache table next to the notes table"""
+    try:
+        db_path = get_db_path()
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        c = conn.cursor()
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS transcript_cache (
+                audio_hash TEXT NOT NULL,
+                language TEXT NOT NULL,
+                transcript TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (audio_hash, language)
+            )
+        ''')
+        add_column_if_missing(c, 'transcript_cache', 'segments', 'BLOB')
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        print(f"Error initializing transcript cache: {e}")
+
+def compute_audio_hash(audio_file) -> str:
+    """SHA-256 of the audio bytes, leaving the file position at the start"""
+    audio_file.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: audio_file.read(1024 * 1024), b""):
+        digest.update(block)
+    audio_file.seek(0)
+    return digest.hexdigest()
+
+def youtube_transcript_key(url):
+    """Transcript cache key for a YouTube link, so a video is transcribed once per language"""
+    video_id = extract_video_id(url)
+    return f"youtube:{video_id}" if video_id else None
+
+def get_cached_transcript(audio_hash, language):
+    """Return (transcript, segments_blob) cached for this audio and language, or None"""
+    try:
+        db_path = get_db_path()
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        c = conn.cursor()
+        c.execute('''
+            SELECT transcript, segments FROM transcript_cache
+            WHERE audio_hash = ? AND language = ?
+        ''', (audio_hash, language))
+        row = c.fetchone()
+        if row:
+            c.execute('''
+                UPDATE transcript_cache SET last_accessed = ?
+                WHERE audio_hash = ? AND language = ?
+            ''', (datetime.now(), audio_hash, language))
+            conn.commit()
+        conn.close()
+        return (row[0], row[1]) if row else None
+    except Exception as e:
+        print(f"Error reading transcript cache: {e}")
+        return None
+
+def save_transcript_to_cache(audio_hash, language, transcript, segments_blob=None):
+    """Store a transcript and evict least recently used entries beyond the size limit"""
+    try:
+        db_path = get_db_path()
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        c = conn.cursor()
+        c.execute('''
+            INSERT OR REPLACE INTO transcript_cache (audio_hash, language, transcript, segments, size_bytes, created_at, last_accessed)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (audio_hash, language, transcript, segments_blob,
+              len(transcript.encode('utf-8')) + len(segments_blob or b''), datetime.now(), datetime.now()))
+
+        c.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM transcript_cache')
+        total_bytes = c.fetchone()[0]
+        if total_bytes > TRANSCRIPT_CACHE_MAX_BYTES:
+            c.execute('SELECT audio_hash, language, size_bytes FROM transcript_cache ORDER BY last_accessed ASC')
+            for old_hash, old_language, size_bytes in c.fetchall():
+                if total_bytes <= TRANSCRIPT_CACHE_MAX_BYTES:
+                    break
+                conn.execute('DELETE FROM transcript_cache WHERE audio_hash = ? AND language = ?', (old_hash, old_language))
+                total_bytes -= size_bytes
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        print(f"Error writing transcript cache: {e}")
+
 # Initialize database on startup
 try:
     init_database()
+    init_transcript_cache()
 except Exception as e:
     print(f"Warning: Database initialization failed: {e}")
     print("Application will continue, but note saving may not work.")
 
+# Answer repeated JSON/title requests from the persistent LLM cache
+if 'groq' in st.session_state and not isinstance(st.session_state.groq, CachedClient):
+    try:
+        st.session_state.groq = CachedClient(st.session_state.groq, get_db_path())
+    except Exception as e:
+        print(f"Warning: LLM cache unavailable: {e}")
+
+# Keep the downloads directory under its quota in the background
+try:
+    start_janitor()
+except Exception as e:
+    print(f"Warning: Download janitor could not start: {e}")
+
 try:
     with st.sidebar:
         st.write(f"# 🧠 EchoMind")
@@ -1444,6 +1953,22 @@ try:
         else:
             st.info("📝 No saved notes yet. Generate notes to see them here!")
         
+        try:
+            download_usage = get_download_usage()
+            st.caption(f"💾 Downloads: {download_usage['total_bytes'] / 1024 / 1024:.0f} MB of {download_usage['quota_bytes'] / 1024 / 1024:.0f} MB")
+        except Exception as e:
+            print(f"Could not read download usage: {e}")
+        if isinstance(st.session_state.get('groq'), CachedClient):
+            llm_cache_stats = st.session_state.groq.cache.stats()
+            st.caption(f"🗃️ LLM cache: {llm_cache_stats['hits']} hits / {llm_cache_stats['misses']} misses")
+        latency_report = getattr(st.session_state.get('groq'), 'latency_report', None)
+        if callable(latency_report):
+            provider_latencies = {key: value for key, value in latency_report().items() if value["p50"] is not None}
+            if provider_latencies:
+                with st.expander("⏱️ Provider latency"):
+                    for key, value in provider_latencies.items():
+                        st.caption(f"{key}: p50 {value['p50']:.2f}s / p95 {value['p95']:.2f}s ({value['samples']} calls)")
+        
         st.write(f"---")
         
         st.markdown("### 👥 Project Information")
@@ -1461,12 +1986,13 @@ try:
     if 'selected_note_id' in st.session_state and st.session_state.selected_note_id:
         note_data = get_note_by_id(st.session_state.selected_note_id)
         if note_data:
-            note_id, title, filename, content, created_at, updated_at = note_data
+            note_id, title, filename, content, created_at, updated_at, segments_blob = note_data
             st.markdown("---")
             st.markdown(f"### 📖 Viewing: {title}")
             st.markdown(f"**File:** {filename if filename else 'Untitled'} | **Created:** {str(created_at)[:16] if created_at else 'Unknown'}")
             st.markdown("---")
             st.markdown(content)
+            render_transcript_search(load_transcript_store(segments_blob), f"note_{note_id}")
             
             # Download buttons for viewed note
             col1, col2 = st.columns(2)
@@ -1525,17 +2051,45 @@ try:
     input_method = "Upload audio file"
     
     with tab_record:
-        try:
-            if hasattr(st, 'audio_input'):
-                recorded_audio = st.audio_input("Click the mic to start recording", key="live_recording")
-                if recorded_audio:
-                    st.session_state.uploaded_filename = "live_recording.wav"
-                    st.session_state.live_audio_bytes = recorded_audio
-                    st.success("✅ Recording captured! Click **Generate Notes** below.")
+        live_mode = False
+        if WEBRTC_AVAILABLE:
+            live_mode = st.checkbox("Live transcription (transcribe while recording)", key="live_mode")
+        if live_mode:
+            transcriber = st.session_state.get('live_transcriber')
+            if transcriber is not None and transcriber.language != lang_code:
+                if transcriber.has_audio():
+                    # Replacing the transcriber now would throw the recording away
+                    st.caption("The language change applies to the next recording.")
+                else:
+                    transcriber.discard()
+                    transcriber = None
+            if transcriber is None:
+                transcriber = LiveTranscriber(st.session_state.groq, language=lang_code)
+                st.session_state.live_transcriber = transcriber
+            start_live_capture(transcriber)
+
+            def show_live_transcript():
+                if transcriber.has_audio():
+                    st.caption(f"Recorded {transcriber.duration / 60:.1f} min")
+                    st.markdown(transcriber.transcript or "_Listening ...._")
+
+            # Refresh the running transcript while recording when fragments are supported
+            if hasattr(st, 'fragment'):
+                st.fragment(run_every=2)(show_live_transcript)()
             else:
-                st.info("Live recording requires Streamlit 1.33+. Please upload an audio file instead.")
-        except Exception as e:
-            st.info("Live recording is not available in this environment. Please upload an audio file instead.")
+                show_live_transcript()
+        else:
+            try:
+                if hasattr(st, 'audio_input'):
+                    recorded_audio = st.audio_input("Click the mic to start recording", key="live_recording")
+                    if recorded_audio:
+                        st.session_state.uploaded_filename = "live_recording.wav"
+                        st.session_state.live_audio_bytes = recorded_audio
+                        st.success("✅ Recording captured! Click **Generate Notes** below.")
+                else:
+                    st.info("Live recording requires Streamlit 1.33+. Please upload an audio file instead.")
+            except Exception as e:
+                st.info("Live recording is not available in this environment. Please upload an audio file instead.")
     
     with tab_upload:
         audio_file = st.file_uploader("Drop an audio file here", type=["mp3", "wav", "m4a", "webm", "mp4", "ogg"], label_visibility="collapsed")
@@ -1640,8 +2194,16 @@ try:
 
     if submitted:
         disable()
+        live_result = None
+        live_transcriber = st.session_state.get('live_transcriber')
+        if st.session_state.get('live_mode') and live_transcriber is not None and live_transcriber.has_audio():
+            # Most of the recording is already transcribed; only the last window is left
+            display_status("Finishing live transcription ....")
+            live_result = live_transcriber.finish()
+            st.session_state.live_transcriber = None
+            st.session_state.uploaded_filename = "live_recording"
         # Check for live recording first
-        if st.session_state.get('live_audio_bytes'):
+        elif st.session_state.get('live_audio_bytes'):
             live_audio = st.session_state.live_audio_bytes
             if hasattr(live_audio, 'read'):
                 live_audio.seek(0)
@@ -1659,6 +2221,8 @@ try:
             input_method = "Upload audio file"
         elif youtube_link:
             input_method = "YouTube link"
+        if live_result is not None:
+            input_method = "Live recording"
         
         if input_method == "Upload audio file" and audio_file is None:
             st.error("Please record audio, upload a file, or paste a YouTube link.")
@@ -1671,9 +2235,65 @@ try:
 
         audio_file_path = None
 
+        transcription_text = None
+        transcript_segments = []
+        transcript_store = None
+        segments_blob = None
+        seeded_structure = None
+        chapter_times = {}
+        if live_result is not None:
+            transcription_text = live_result["text"]
+            transcript_segments = live_result["segments"]
+
         if input_method == "YouTube link":
+            # Captions and chapters let us skip Whisper and outline generation entirely
+            display_status("Checking YouTube captions and chapters ....")
+            try:
+                fast_path = get_youtube_fast_path(youtube_link, language=lang_code, external_logger=display_download_status)
+                transcription_text = fast_path["transcript"]
+                transcript_segments = fast_path["segments"]
+                seeded_structure = fast_path["structure"]
+                chapter_times = fast_path["chapter_times"]
+            except Exception as e:
+                print(f"YouTube fast path unavailable: {e}")
+
+        youtube_cache_key = youtube_transcript_key(youtube_link) if input_method == "YouTube link" else None
+        transcript_from_cache = False
+        if transcription_text is None and youtube_cache_key:
+            # Re-running a video (e.g. with another note style) reuses its Whisper transcript
+            cached = get_cached_transcript(youtube_cache_key, lang_code)
+            if cached is not None:
+                transcription_text, segments_blob = cached
+                transcript_store = load_transcript_store(segments_blob)
+                transcript_from_cache = True
+
+        if transcription_text is None and input_method == "YouTube link":
+            # Reject oversized or overlong videos before any audio is transferred
+            media_plan = plan_media(probe_youtube(youtube_link), can_process=can_chunk_audio())
+            if media_plan["action"] == "reject":
+                raise ValueError(media_plan["reason"])
+
+        if input_method == "Live recording":
+            display_status("Using live transcript ....")
+        elif transcript_from_cache:
+            display_status("Using cached transcript ....")
+        elif transcription_text is not None:
+            display_status("Using YouTube captions as transcript ....")
+        elif input_method == "YouTube link" and can_chunk_audio():
+            # Pipelined mode: segments are transcribed while the rest is still downloading
+            display_status("Downloading and transcribing YouTube audio ....")
+            with tempfile.TemporaryDirectory(prefix="echomind_stream_") as stream_dir:
+                segments = cached_audio_segments(youtube_link, stream_dir, display_download_status)
+                result = transcribe_segment_stream(st.session_state.groq, segments, language=lang_code)
+            transcription_text = result["text"]
+            transcript_store = build_transcript_store(result["segments"])
+            segments_blob = transcript_store.to_blob() if transcript_store else None
+            if youtube_cache_key:
+                save_transcript_to_cache(youtube_cache_key, lang_code, transcription_text, segments_blob)
+            clear_download_status()
+        elif input_method == "YouTube link":
             display_status("Downloading audio from YouTube link ....")
-            audio_file_path = download_video_audio(youtube_link, display_download_status)
+            audio_file_path, audio_is_cached = cached_download(youtube_link, display_download_status)
             if audio_file_path is None:
                 st.error("Failed to download audio from YouTube link. Please try again.")
                 enable()
@@ -1683,28 +2303,75 @@ try:
                 with open(audio_file_path, 'rb') as f:
                     file_contents = f.read()
                 audio_file = BytesIO(file_contents)
-                if os.path.getsize(audio_file_path) > MAX_FILE_SIZE:
+                if os.path.getsize(audio_file_path) > MAX_FILE_SIZE and not can_chunk_audio():
                     raise ValueError(FILE_TOO_LARGE_MESSAGE)
                 audio_file.name = os.path.basename(audio_file_path)
-                delete_download(audio_file_path)
+                # Cached files are shared with other requests for the same video
+                if not audio_is_cached:
+                    delete_download(audio_file_path)
             clear_download_status()
 
-        display_status("Transcribing audio ....")
-        transcription_text = transcribe_audio(audio_file, language=lang_code)
+        if transcription_text is None:
+            audio_hash = compute_audio_hash(audio_file)
+            cached = get_cached_transcript(audio_hash, lang_code)
+            if cached is None:
+                display_status("Transcribing audio ....")
+                result = transcribe_audio(audio_file, language=lang_code)
+                transcription_text = result["text"]
+                transcript_store = build_transcript_store(result["segments"])
+                segments_blob = transcript_store.to_blob() if transcript_store else None
+                save_transcript_to_cache(audio_hash, lang_code, transcription_text, segments_blob)
+            else:
+                display_status("Using cached transcript ....")
+                transcription_text, segments_blob = cached
+                transcript_store = load_transcript_store(segments_blob)
+        elif transcript_store is None and segments_blob is None:
+            transcript_store = build_transcript_store(transcript_segments)
+            segments_blob = transcript_store.to_blob() if transcript_store else None
+        # Fillers, stutters and repetition loops would otherwise be re-sent in every prompt
+        cleanup = clean_transcript(transcription_text, language=lang_code)
+        transcription_text = cleanup["text"]
+        if cleanup["tokens_saved"] > 0:
+            print(f"Transcript cleanup saved ~{cleanup['tokens_saved']} of {cleanup['tokens_before']} tokens")
+            st.caption(f"🧹 Transcript cleanup removed ~{cleanup['tokens_saved']} tokens ({cleanup['tokens_saved'] / max(cleanup['tokens_before'], 1):.0%})")
+        if transcript_store is not None:
+            # Offsets must point into the text the notes are written from, not the raw segments
+            transcript_store = transcript_store.rebase(transcription_text)
+            segments_blob = transcript_store.to_blob()
         st.session_state.transcription_text = transcription_text
+        st.session_state.transcript_segments = transcript_store
         display_statistics()
         
-        display_status("Detecting topic ....")
-        smart_title = generate_title(transcription_text, model=CONTENT_MODEL)
+        # Transcripts too long for one outline prompt are outlined window by window
+        outline_plan = plan_prompt(transcription_text, OUTLINE_MODEL, OUTLINE_MAX_TOKENS, fallback="map_reduce")
+        use_map_reduce = not seeded_structure and outline_plan["strategy"] == "map_reduce"
+        section_sources = {}
+
+        # Title, speakers and outline come from one call; the separate calls are the fallback
+        display_status("Detecting topic, speakers and notes structure ....")
+        try:
+            large_model_generation_statistics, smart_title, speaker_info, notes_structure = generate_preamble(transcription_text, model=OUTLINE_MODEL, note_style=note_style, include_structure=not (seeded_structure or use_map_reduce))
+        except Exception as e:
+            print(f"Combined preamble failed, falling back to separate calls: {e}")
+            large_model_generation_statistics = GenerationStatistics(model_name=OUTLINE_MODEL)
+            display_status("Detecting topic ....")
+            smart_title = generate_title(transcription_text, model=CONTENT_MODEL)
+            display_status("Identifying speakers ....")
+            speaker_info = identify_speakers(transcription_text, model=CONTENT_MODEL)
+            notes_structure = None
         st.session_state.notes_title = smart_title
         st.session_state.uploaded_filename = smart_title
-        
-        display_status("Identifying speakers ....")
-        speaker_info = identify_speakers(transcription_text, model=CONTENT_MODEL)
         st.session_state.speaker_info = speaker_info
 
-        display_status("Generating notes structure ....")
-        large_model_generation_statistics, notes_structure = generate_notes_structure(transcription_text, model=OUTLINE_MODEL, note_style=note_style)
+        if seeded_structure:
+            display_status("Using video chapters as notes structure ....")
+            notes_structure = json.dumps(seeded_structure)
+        elif use_map_reduce:
+            display_status(f"Outlining {len(outline_plan['chunks'])} parts of a long transcript ....")
+            large_model_generation_statistics, notes_structure, section_sources = generate_notes_structure_map_reduce(outline_plan["chunks"], model=OUTLINE_MODEL, note_style=note_style)
+        elif notes_structure is None:
+            display_status("Generating notes structure ....")
+            large_model_generation_statistics, notes_structure = generate_notes_structure(transcription_text, model=OUTLINE_MODEL, note_style=note_style)
 
         display_status("Generating notes ...")
         total_generation_statistics = GenerationStatistics(model_name=CONTENT_MODEL)
@@ -1719,22 +2386,58 @@ try:
 
             st.session_state.notes.display_structure()
 
-            def stream_section_content(sections):
-                for title, content in sections.items():
-                    if isinstance(content, str):
-                        content_stream = generate_section(transcript=transcription_text, existing_notes=notes.return_existing_contents(), section=(title + ": " + content), model=CONTENT_MODEL, note_style=note_style)
-                        for chunk in content_stream:
-                            chunk_data = chunk
-                            if type(chunk_data) == GenerationStatistics:
-                                total_generation_statistics.add(chunk_data)
-                                st.session_state.statistics_text = str(total_generation_statistics)
-                                display_statistics()
-                            elif chunk is not None:
-                                st.session_state.notes.update_content(title, chunk)
-                    elif isinstance(content, dict):
-                        stream_section_content(content)
-
-            stream_section_content(notes_structure_json)
+            groq_client = st.session_state.groq
+            # Short digests of finished sections stand in for their full text in later prompts
+            covered_digest = CoveredDigest()
+            # Long transcripts are indexed so each section only gets the passages relevant to it
+            transcript_index = build_transcript_index(transcription_text)
+            window_ranges = window_word_ranges(outline_plan["chunks"])
+            # Each section reserves only the output tokens it is likely to need
+            section_budget = SectionBudget(get_db_path(), CONTENT_MODEL, note_style)
+            section_jobs = flatten_section_jobs(notes_structure_json)
+            transcript_tokens = estimate_tokens(transcription_text)
+            # Fitted once with the largest allowance so every full-transcript section shares the same prompt prefix
+            shared_transcript = fit_text(transcription_text, CONTENT_MODEL, SECTION_MAX_OUTPUT_TOKENS)
+
+            def generate_section_content(title, content):
+                section = title + ": " + content
+                # Chapter sections are written from the transcript of their own time range
+                chapter_transcript = transcript_store.slice_by_time(*chapter_times[title]) if title in chapter_times and transcript_index and transcript_store is not None else ""
+                if chapter_transcript:
+                    section_transcript = chapter_transcript
+                elif section_sources.get(title) and transcript_index:
+                    # Map-reduce outlines know which windows each section came from; rank passages inside them only
+                    candidates = [passage for i in section_sources[title] for passage in transcript_index.passages_in(*window_ranges[i])]
+                    section_transcript = transcript_index.context_for(section, candidates=candidates)
+                elif section_sources.get(title):
+                    section_transcript = "\n\n[...]\n\n".join(outline_plan["chunks"][i] for i in section_sources[title])
+                elif transcript_index:
+                    section_transcript = transcript_index.context_for(section)
+                else:
+                    section_transcript = None
+                # A section written from the whole transcript covers roughly an equal share of it
+                source_tokens = transcript_tokens // len(section_jobs) if section_transcript is None else estimate_tokens(section_transcript)
+                estimated_tokens, max_tokens = section_budget.allowance(content, source_tokens)
+                section_transcript = shared_transcript if section_transcript is None else fit_text(section_transcript, CONTENT_MODEL, max_tokens)
+                for item in generate_section(transcript=section_transcript, existing_notes=covered_digest.render(), section=section, model=CONTENT_MODEL, note_style=note_style, groq_client=groq_client, max_tokens=max_tokens):
+                    if isinstance(item, GenerationStatistics):
+                        section_budget.record(estimated_tokens, max_tokens, item.output_tokens)
+                    yield item
+
+            def add_section_statistics(statistics):
+                total_generation_statistics.add(statistics)
+                st.session_state.statistics_text = str(total_generation_statistics)
+                display_statistics()
+
+            # Sections are generated in parallel; each one streams into its own placeholder
+            run_sections_concurrently(
+                section_jobs,
+                generate_section_content,
+                on_token=st.session_state.notes.update_content,
+                on_statistics=add_section_statistics,
+                on_error=lambda title, error: st.warning(f"Could not generate section '{title}': {error}"),
+                on_done=lambda title: covered_digest.add(title, st.session_state.notes.contents.get(title, "")),
+            )
         except json.JSONDecodeError:
             st.error("Failed to decode the notes structure. Please try again.")
 
@@ -1747,7 +2450,7 @@ try:
                 title = st.session_state.get('notes_title', 'Untitled Notes')
                 filename = st.session_state.get('uploaded_filename', title)
                 title = title.replace('_', ' ').replace('-', ' ').title()
-                note_id = save_note_to_db(title, filename, notes_content)
+                note_id = save_note_to_db(title, filename, notes_content, segments_blob)
                 if note_id:
                     st.success(f"✅ Notes saved! (ID: {note_id})")
             except Exception as e:
@@ -1770,24 +2473,60 @@ except Exception as e:
     if st.button("Clear"):
         st.rerun()
 
+# Message and stored value for each analytics stage that fails
+ANALYTICS_FAILURES = {
+    "flowchart_data": ("Error extracting topics", None),
+    "sentiment_result": ("Sentiment analysis failed", {}),
+    "quiz_data": ("Quiz generation failed", {"quiz_title": "Quiz Generation Failed", "questions": []}),
+    "flashcards": ("Flashcard generation failed", []),
+}
+
+def run_notes_analytics(notes_content: str):
+    """
+    Run the analytics stages that only depend on the finished notes (topic extraction,
+    sentiment, quiz, flashcards) side by side and store their results in the session.
+    Stages whose results are already in the session are skipped.
+    """
+    groq_client = st.session_state.groq
+    stages = []
+    if FLOWCHART_AVAILABLE and 'flowchart_data' not in st.session_state:
+        stages.append(Stage("flowchart_data", lambda notes_content: extract_topics_and_relationships(notes_content, model=CONTENT_MODEL, groq_client=groq_client), inputs=["notes_content"]))
+    if 'sentiment_result' not in st.session_state:
+        stages.append(Stage("sentiment_result", lambda notes_content: analyze_sentiment_with_groq(notes_content, groq_client), inputs=["notes_content"]))
+    if 'quiz_data' not in st.session_state:
+        stages.append(Stage("quiz_data", lambda notes_content: generate_quiz(notes_content, groq_client), inputs=["notes_content"]))
+    if 'flashcards' not in st.session_state:
+        stages.append(Stage("flashcards", lambda notes_content: generate_flashcards(notes_content, groq_client), inputs=["notes_content"]))
+    if not stages:
+        return
+
+    result = Pipeline(stages).run({"notes_content": notes_content})
+    for stage in stages:
+        if stage.name in result["values"]:
+            st.session_state[stage.name] = result["values"][stage.name]
+        elif stage.name in result["errors"]:
+            # Workers have no Streamlit context, so failures are reported here on the script thread
+            label, fallback = ANALYTICS_FAILURES[stage.name]
+            st.error(f"{label}: {str(result['errors'][stage.name])}")
+            st.session_state[stage.name] = fallback
+    if 'flowchart_data' in result["values"]:
+        st.session_state.flowchart_generated = False
+
+# Analytics stages only need the notes, so they run concurrently before anything is rendered
+if "notes" in st.session_state and 'groq' in st.session_state:
+    with st.spinner("🔄 Analyzing topics, sentiment, quiz and flashcards..."):
+        try:
+            run_notes_analytics(st.session_state.notes.get_markdown_content())
+        except Exception as e:
+            print(f"Notes analytics pipeline failed: {e}")
+
 # Flowchart section - generate and display flowchart
 if "notes" in st.session_state:
     st.markdown("---")
     st.markdown("### 📊 Topic Flowchart")
     
     if FLOWCHART_AVAILABLE:
-        # Check if flowchart has already been generated
-        if 'flowchart_data' not in st.session_state:
-            with st.spinner("🔄 Analyzing topics and generating flowchart..."):
-                try:
-                    notes_content = st.session_state.notes.get_markdown_content()
-                    topics_data = extract_topics_and_relationships(notes_content, model=CONTENT_MODEL)
-                    st.session_state.flowchart_data = topics_data
-                    st.session_state.flowchart_generated = False
-                except Exception as e:
-                    st.error(f"Error extracting topics: {str(e)}")
-                    st.session_state.flowchart_data = None
-        
+        # Topics are extracted by run_notes_analytics above
         # Generate flowchart if we have topics data
         flowchart_data = st.session_state.get('flowchart_data')
         if flowchart_data and flowchart_data.get("topics"):
@@ -1906,6 +2645,8 @@ if "notes" in st.session_state:
     if not base_filename:
         base_filename = 'generated_notes'
 
+    render_transcript_search(st.session_state.get('transcript_segments'), "current")
+
     # Create two columns for download buttons
     download_col1, download_col2 = st.columns(2)
     
@@ -1974,7 +2715,11 @@ if "notes" in st.session_state:
             with st.spinner("Creating study flashcards..."):
                 from flashcard_generator import generate_flashcards
                 notes_content = st.session_state.notes.get_markdown_content()
-                st.session_state.flashcards = generate_flashcards(notes_content, st.session_state.groq)
+                try:
+                    st.session_state.flashcards = generate_flashcards(notes_content, st.session_state.groq)
+                except Exception as e:
+                    st.error(f"Flashcard generation failed: {str(e)}")
+                    st.session_state.flashcards = []
         
         from flashcard_generator import render_flashcards
         render_flashcards(st.session_state.flashcards)
@@ -0,0 +1,110 @@
+"""
+Media Probe module for EchoMind
+Reads duration, codec and (estimated) size of an input before anything is
+transferred or uploaded, and decides whether to reject, chunk, transcode or
+send it as-is.
+"""
+import json
+import os
+import subprocess
+
+import yt_dlp as youtube_dl
+
+from audio_processing import check_ffprobe_available, AUDIO_BITRATE
+from download import (
+    MAX_FILE_SIZE, FILE_TOO_LARGE_MESSAGE, get_ydl_opts, resolve_video_info, estimate_info_size,
+    load_cached_video_info, extract_video_id,
+)
+from transcription import CHUNK_SECONDS
+
+MAX_MEDIA_SECONDS = int(os.environ.get("MAX_MEDIA_SECONDS", 4 * 60 * 60))
+MAX_DOWNLOAD_BYTES = int(os.environ.get("MAX_DOWNLOAD_BYTES", 500 * 1024 * 1024))
+
+# Codecs Whisper accepts that are already compact enough to upload untouched
+SPEECH_FRIENDLY_CODECS = {"opus", "mp3", "aac", "vorbis"}
+SPEECH_BITRATE = int(AUDIO_BITRATE.rstrip("kK")) * 1000
+
+
+def probe_youtube_info(info):
+    """Build a probe result from an already resolved yt-dlp info dict."""
+    formats = info.get("requested_formats") or [info]
+    audio = next((fmt for fmt in formats if fmt.get("acodec") not in (None, "none")), formats[0])
+    return {
+        "source": "youtube",
+        "duration": float(info.get("duration") or 0),
+        "codec": audio.get("acodec"),
+        "bitrate": int((audio.get("abr") or audio.get("tbr") or 0) * 1000),
+        "size": estimate_info_size(info),
+    }
+
+
+def probe_youtube(url):
+    """
+    Probe a YouTube link without downloading. Duration and size do not change, so
+    a cached info dict is used regardless of age; otherwise the link is resolved.
+    """
+    info = load_cached_video_info(extract_video_id(url), max_age=None)
+    if info is not None:
+        return probe_youtube_info(info)
+    with youtube_dl.YoutubeDL(get_ydl_opts(use_ffmpeg=False)) as ydl:
+        info, _ = resolve_video_info(ydl, url)
+    return probe_youtube_info(info)
+
+
+def probe_file(path):
+    """
+    Probe a local file with ffprobe, reading duration, codec and bitrate from the
+    container headers. Falls back to the file size alone without ffprobe.
+    """
+    result = {"source": "file", "duration": 0.0, "codec": None, "bitrate": 0, "size": os.path.getsize(path)}
+    if not check_ffprobe_available():
+        return result
+    try:
+        output = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "a:0",
+                "-show_entries", "format=duration,bit_rate:stream=codec_name,bit_rate",
+                "-of", "json",
+                path,
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        data = json.loads(output or "{}")
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        print(f"Could not probe {path}: {e}")
+        return result
+
+    stream = (data.get("streams") or [{}])[0]
+    container = data.get("format") or {}
+    result["duration"] = float(container.get("duration") or 0)
+    result["codec"] = stream.get("codec_name")
+    result["bitrate"] = int(stream.get("bit_rate") or container.get("bit_rate") or 0)
+    return result
+
+
+def plan_media(probe, can_process=None):
+    """
+    Decide what to do with a probed input.
+    Returns {"action": "reject" | "chunk" | "transcode" | "direct", "reason": str}.
+    `can_process` says whether ffmpeg is available to chunk or transcode.
+    """
+    if can_process is None:
+        can_process = check_ffprobe_available()
+    duration, size = probe["duration"], probe["size"]
+
+    if duration > MAX_MEDIA_SECONDS:
+        return {"action": "reject", "reason": f"The recording is {duration / 3600:.1f} hours long; the limit is {MAX_MEDIA_SECONDS / 3600:.1f} hours. Please use a shorter clip."}
+    if probe["source"] == "youtube" and size > MAX_DOWNLOAD_BYTES:
+        return {"action": "reject", "reason": f"The video audio is about {size / 1024 / 1024:.0f} MB; the download limit is {MAX_DOWNLOAD_BYTES / 1024 / 1024:.0f} MB. Please use a shorter video."}
+    if not can_process:
+        if size > MAX_FILE_SIZE:
+            return {"action": "reject", "reason": FILE_TOO_LARGE_MESSAGE}
+        return {"action": "direct", "reason": "FFmpeg is not available, sending the audio unchanged."}
+    if duration > CHUNK_SECONDS or (not duration and size > MAX_FILE_SIZE):
+        return {"action": "chunk", "reason": "Long recording, splitting into chunks."}
+    if probe["codec"] not in SPEECH_FRIENDLY_CODECS or probe["bitrate"] > 2 * SPEECH_BITRATE:
+        return {"action": "transcode", "reason": "Re-encoding to compact speech audio."}
+    return {"action": "direct", "reason": "Audio is already compact."}
@@ -0,0 +1,75 @@
+"""
+Notes Digest module for EchoMind
+Keeps a short "already covered" memory of finished note sections (title plus
+key terms) that later section prompts use instead of the full text of every
+earlier section, so prompt size stays flat however long the outline is.
+"""
+import os
+import re
+import threading
+from collections import Counter
+
+from transcript_retrieval import tokenize
+
+DIGEST_MAX_CHARS = int(os.environ.get("DIGEST_MAX_CHARS", 2000))
+DIGEST_TERMS_PER_SECTION = 8
+
+STOPWORDS = set("""
+a about above after again all also am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his how
+i if in into is it its itself just like many may me might more most much must my no nor not now of off on once only
+or other our out over own same she should so some such than that the their them then there these they this those
+through to too under until up use used uses using very was we were what when where which while who whom why will
+with would you your
+""".split())
+
+BOLD_PATTERN = re.compile(r"\*\*([^*\n]{2,60})\*\*")
+
+
+def summarize_section(title, content, max_terms=DIGEST_TERMS_PER_SECTION):
+    """
+    One-line local digest of a generated section: its title and key terms.
+    Bold phrases come first, then the most frequent content words.
+    """
+    terms = []
+    for phrase in BOLD_PATTERN.findall(content):
+        phrase = phrase.strip(" :.-")
+        if phrase and phrase.lower() not in (t.lower() for t in terms):
+            terms.append(phrase)
+        if len(terms) >= max_terms:
+            break
+
+    if len(terms) < max_terms:
+        counts = Counter(token for token in tokenize(content) if token not in STOPWORDS and not token.isdigit())
+        seen = " ".join(terms).lower()
+        for token, _ in counts.most_common():
+            if len(terms) >= max_terms:
+                break
+            if token not in seen:
+                terms.append(token)
+    return f"- {title}: {', '.join(terms)}" if terms else f"- {title}"
+
+
+class CoveredDigest:
+    """
+    Thread-safe list of section digests, capped at `max_chars`.
+    When the cap is reached the oldest digests are dropped.
+    """
+    def __init__(self, max_chars=DIGEST_MAX_CHARS):
+        self.max_chars = max_chars
+        self.lock = threading.Lock()
+        self.entries = []
+
+    def add(self, title, content):
+        if not content.strip():
+            return
+        line = summarize_section(title, content)
+        with self.lock:
+            self.entries.append(line)
+            while len(self.entries) > 1 and sum(len(entry) + 1 for entry in self.entries) > self.max_chars:
+                self.entries.pop(0)
+
+    def render(self):
+        """Text for the prompt; empty until a section has finished."""
+        with self.lock:
+            return "\n".join(self.entries)
@@ -0,0 +1,79 @@
+"""
+Pipeline module for EchoMind
+Small dependency-aware executor: each stage declares the values it needs and the
+values it produces, and stages whose inputs are ready run concurrently on a
+worker pool with per-stage timing and failure isolation.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+PIPELINE_WORKERS = int(os.environ.get("PIPELINE_WORKERS", 4))
+
+
+class Stage:
+    """
+    A unit of work. `func` is called with its `inputs` as keyword arguments and
+    returns the single output value, or a dict keyed by output name when a stage
+    declares several `outputs` (defaults to one output named after the stage).
+    """
+    def __init__(self, name, func, inputs=(), outputs=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs) if outputs else [name]
+
+
+class Pipeline:
+    def __init__(self, stages, max_workers=PIPELINE_WORKERS):
+        self.stages = list(stages)
+        self.max_workers = max_workers
+        producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"'{output}' is produced by both '{producers[output]}' and '{stage.name}'")
+                producers[output] = stage.name
+
+    def run(self, initial=None):
+        """
+        Run every stage whose inputs can be satisfied.
+        Returns {"values": dict, "timings": {stage: seconds}, "errors": {stage: exception},
+        "skipped": [stages whose inputs were never produced]}.
+        A failed stage only affects the stages that depend on its outputs.
+        """
+        values = dict(initial or {})
+        timings, errors = {}, {}
+        pending = list(self.stages)
+        running = {}
+
+        def timed(stage, kwargs):
+            started = time.time()
+            try:
+                return stage.func(**kwargs)
+            finally:
+                timings[stage.name] = time.time() - started
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            while True:
+                for stage in [s for s in pending if all(name in values for name in s.inputs)]:
+                    pending.remove(stage)
+                    kwargs = {name: values[name] for name in stage.inputs}
+                    running[executor.submit(timed, stage, kwargs)] = stage
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        result = future.result()
+                        outputs = {stage.outputs[0]: result} if len(stage.outputs) == 1 else {name: result[name] for name in stage.outputs}
+                    except Exception as e:
+                        print(f"Pipeline stage '{stage.name}' failed after {timings.get(stage.name, 0):.2f}s: {e}")
+                        errors[stage.name] = e
+                        continue
+                    values.update(outputs)
+                    print(f"Pipeline stage '{stage.name}' finished in {timings[stage.name]:.2f}s")
+
+        return {"values": values, "timings": timings, "errors": errors, "skipped": [stage.name for stage in pending]}
@@ -4,6 +4,8 @@ Extracts topics from PPTX/PDF presentations and generates YouTube playlist recom
 """
 import json
 
+from token_budget import fit_text
+
 
 def extract_pdf_text(uploaded_file):
     """Extract text from a PDF file, page by page."""
@@ -121,7 +123,7 @@ Be thorough. Identify ALL distinct topics."""
             },
             {
                 "role": "user",
-                "content": f"Analyze this presentation:\n\n{all_text[:8000]}"
+                "content": f"Analyze this presentation:\n\n{fit_text(all_text, model, 4000, limit=2000)}"
             }
         ],
         temperature=0.3,
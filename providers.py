@@ -0,0 +1,384 @@
+"""
+Providers module for EchoMind
+Chat completion providers behind one client: Groq first, then any OpenAI-compatible
+endpoint (Gemini when GEMINI_API_KEY is set). Tracks latency per provider, model and
+request size, opens a circuit breaker on repeated failures, fails over on errors and,
+for streaming calls, fires a hedged duplicate request when the first token is slower
+than usual.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import httpx
+
+from rate_limiter import RateLimitedClient, set_send_hook, notify_send
+from token_budget import estimate_tokens
+
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+# Optional second Groq model used for hedging when no other provider is configured
+GROQ_FALLBACK_MODEL = os.environ.get("GROQ_FALLBACK_MODEL")
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", 95))
+HEDGE_MIN_SECONDS = float(os.environ.get("HEDGE_MIN_SECONDS", 2.0))
+# Hedge delay used until enough latencies have been observed
+HEDGE_DEFAULT_SECONDS = float(os.environ.get("HEDGE_DEFAULT_SECONDS", 8.0))
+HEDGE_MIN_SAMPLES = 10
+LATENCY_WINDOW = 100
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", 3))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BREAKER_COOLDOWN_SECONDS", 30))
+PROVIDER_TIMEOUT_SECONDS = 120.0
+
+
+class AttemptCancelled(Exception):
+    """Raised inside a losing attempt that has not been sent yet."""
+
+
+def _close_quietly(*resources):
+    """Close streams and responses of an attempt that lost a hedge race."""
+    for resource in resources:
+        close = getattr(resource, "close", None)
+        if close is None:
+            continue
+        try:
+            close()
+        except Exception as e:
+            print(f"Could not close abandoned response: {e}")
+
+
+def size_bucket(kwargs):
+    """
+    Power-of-two bucket of the estimated prompt tokens, so latencies of short and
+    long prompts are tracked separately.
+    """
+    prompt = " ".join(str(message.get("content") or "") for message in kwargs.get("messages") or [])
+    return estimate_tokens(prompt).bit_length()
+
+
+def _namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+class LatencyTracker:
+    """Recent latency samples for one provider, model and call type."""
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percent):
+        with self.lock:
+            samples = sorted(self.samples)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        index = min(int(round(percent / 100.0 * (len(samples) - 1))), len(samples) - 1)
+        return samples[index]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive errors and rejects calls for `cooldown`
+    seconds. After that calls are let through again (half-open); one more failure
+    reopens it and a success closes it.
+    """
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            return self.opened_at is None or time.monotonic() - self.opened_at >= self.cooldown
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.opened_at is not None or self.consecutive_failures >= self.failures:
+                self.opened_at = time.monotonic()
+
+
+class GroqProvider:
+    """The Groq SDK client (optionally pinned to a different model)."""
+    def __init__(self, client, name="groq", model=None):
+        self.client = client
+        self.name = name
+        self.model = model
+
+    def model_for(self, model):
+        return self.model or model
+
+    def create(self, **kwargs):
+        # A RateLimitedClient signals the send itself, once its limiter admits the call
+        if not isinstance(self.client, RateLimitedClient):
+            notify_send()
+        return self.client.chat.completions.create(**kwargs)
+
+
+class OpenAICompatibleProvider:
+    """Any /chat/completions endpoint that speaks the OpenAI wire format, called with httpx."""
+    def __init__(self, name, base_url, api_key, model, timeout=PROVIDER_TIMEOUT_SECONDS):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.http = httpx.Client(timeout=timeout)
+
+    def model_for(self, model):
+        return self.model
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def create(self, **kwargs):
+        payload = {key: value for key, value in kwargs.items() if value is not None}
+        if payload.get("stream"):
+            return self._stream(payload)
+        started = time.time()
+        notify_send()
+        response = self.http.post(f"{self.base_url}/chat/completions", headers=self._headers(), json=payload)
+        response.raise_for_status()
+        completion = _namespace(response.json())
+        elapsed = time.time() - started
+        # Callers read Groq's timing fields from usage
+        usage = getattr(completion, "usage", None) or SimpleNamespace()
+        for field, default in (("prompt_tokens", 0), ("completion_tokens", 0), ("total_tokens", 0),
+                               ("prompt_time", 0.0), ("completion_time", elapsed), ("total_time", elapsed)):
+            if getattr(usage, field, None) is None:
+                setattr(usage, field, default)
+        completion.usage = usage
+        return completion
+
+    def _stream(self, payload):
+        notify_send()
+        with self.http.stream("POST", f"{self.base_url}/chat/completions", headers=self._headers(), json=payload) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = _namespace(json.loads(data))
+                chunk.x_groq = getattr(chunk, "x_groq", None)
+                for choice in getattr(chunk, "choices", None) or []:
+                    if not hasattr(choice, "delta"):
+                        choice.delta = SimpleNamespace()
+                    if not hasattr(choice.delta, "content"):
+                        choice.delta.content = None
+                yield chunk
+
+
+class _Attempt:
+    """One request to one provider. `sent` is when it actually went out (after any queueing)."""
+    def __init__(self, provider, model):
+        self.provider = provider
+        self.model = model
+        self.sent = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def mark_sent(self):
+        with self.lock:
+            if self.cancelled:
+                raise AttemptCancelled()
+            self.sent = time.monotonic()
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+
+
+class _FailoverCompletions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, **kwargs):
+        return self.owner.create(**kwargs)
+
+
+class FailoverClient:
+    """
+    Routes chat completions across providers in order of preference.
+    A call goes to the first provider whose breaker is closed. If it fails, the next
+    provider is tried. For streaming calls, if the first token has not arrived within
+    the provider's usual time-to-first-token for prompts of that size, a hedged copy
+    is sent to the next provider; whichever streams first wins and the other is closed.
+    Non-streaming calls are never duplicated, only failed over.
+    Everything other than chat (e.g. audio) goes to the first provider's client.
+    """
+    def __init__(self, providers):
+        self.providers = list(providers)
+        self.breakers = {provider.name: CircuitBreaker() for provider in self.providers}
+        self.latencies = {}
+        self.latencies_lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_FailoverCompletions(self))
+
+    def __getattr__(self, name):
+        return getattr(self.providers[0].client, name)
+
+    def tracker(self, provider, model, stream, bucket):
+        """Streaming calls track time to first token, others the full response time."""
+        with self.latencies_lock:
+            return self.latencies.setdefault((provider.name, model, bool(stream), bucket), LatencyTracker())
+
+    def hedge_delay(self, provider, model, bucket):
+        observed = self.tracker(provider, model, True, bucket).percentile(HEDGE_PERCENTILE)
+        return max(observed if observed is not None else HEDGE_DEFAULT_SECONDS, HEDGE_MIN_SECONDS)
+
+    def latency_report(self):
+        """p50/p95 latency per provider, model, call type and prompt size bucket, for display."""
+        report = {}
+        with self.latencies_lock:
+            items = list(self.latencies.items())
+        for (name, model, stream, bucket), tracker in items:
+            report[f"{name}:{model}:{'ttft' if stream else 'total'}:~{2 ** bucket} tokens"] = {"p50": tracker.percentile(50), "p95": tracker.percentile(95), "samples": len(tracker.samples)}
+        return report
+
+    def _start(self, provider, kwargs, results):
+        """
+        Run one attempt on its own thread. Posts ("sent", attempt) once the request
+        goes out and ("done", attempt, (first_item, rest, response, error)) when it finishes.
+        """
+        model = provider.model_for(kwargs.get("model"))
+        attempt = _Attempt(provider, model)
+        request = dict(kwargs, model=model)
+
+        def sent():
+            attempt.mark_sent()
+            results.put(("sent", attempt, None))
+
+        def post(outcome, *resources):
+            # Checked under the attempt's lock so a cancelled loser never leaves a stream open
+            with attempt.lock:
+                if not attempt.cancelled:
+                    results.put(("done", attempt, outcome))
+                    return
+            _close_quietly(*resources)
+
+        def run():
+            set_send_hook(sent)
+            try:
+                response = provider.create(**request)
+                if request.get("stream"):
+                    iterator = iter(response)
+                    first = next(iterator, None)
+                    post((first, iterator, response, None), iterator, response)
+                else:
+                    post((response, None, None, None))
+            except AttemptCancelled:
+                pass
+            except Exception as e:
+                post((None, None, None, e))
+            finally:
+                set_send_hook(None)
+
+        threading.Thread(target=run, name=f"llm-{provider.name}", daemon=True).start()
+        return attempt
+
+    def create(self, **kwargs):
+        candidates = [provider for provider in self.providers if self.breakers[provider.name].allow()]
+        if not candidates:
+            # Every breaker is open: try the preferred provider anyway rather than fail outright
+            candidates = self.providers[:1]
+
+        stream = bool(kwargs.get("stream"))
+        bucket = size_bucket(kwargs)
+        results = queue.Queue()
+        attempts = []
+        last_error = None
+
+        def launch():
+            attempts.append(self._start(candidates[len(attempts)], kwargs, results))
+            return attempts[-1]
+
+        primary = launch()
+        hedged = False
+        deadline = None
+        while True:
+            in_flight = [attempt for attempt in attempts if not attempt.cancelled]
+            if not in_flight:
+                raise last_error
+            # Only the primary of a streaming call is hedged, timed from when it was sent
+            can_hedge = stream and not hedged and deadline is not None and len(attempts) < len(candidates)
+            try:
+                kind, attempt, outcome = results.get(timeout=max(deadline - time.monotonic(), 0) if can_hedge else None)
+            except queue.Empty:
+                hedge = launch()
+                hedged = True
+                print(f"Hedging slow {primary.provider.name} request with {hedge.provider.name}")
+                continue
+
+            if kind == "sent":
+                if attempt is primary:
+                    deadline = attempt.sent + self.hedge_delay(primary.provider, primary.model, bucket)
+                continue
+
+            first, rest, response, error = outcome
+            breaker = self.breakers[attempt.provider.name]
+            if error is not None:
+                breaker.record_failure()
+                last_error = error
+                attempt.cancel()
+                print(f"Provider {attempt.provider.name} failed: {error}")
+                if len(attempts) < len(candidates) and not any(not a.cancelled for a in attempts):
+                    launch()
+                    deadline = None
+                continue
+
+            breaker.record_success()
+            if attempt.sent is not None:
+                self.tracker(attempt.provider, attempt.model, stream, bucket).record(time.monotonic() - attempt.sent)
+            self._abandon([other for other in attempts if other is not attempt], results)
+            if not stream:
+                return first
+            return self._resume(first, rest, response)
+
+    @staticmethod
+    def _abandon(losers, results):
+        """Cancel the other attempts and close anything they already delivered."""
+        for loser in losers:
+            loser.cancel()
+        while True:
+            try:
+                kind, _, outcome = results.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "done":
+                _close_quietly(outcome[1], outcome[2])
+
+    @staticmethod
+    def _resume(first, rest, response):
+        try:
+            if first is not None:
+                yield first
+            yield from rest
+        finally:
+            _close_quietly(rest, response)
+
+
+def build_provider_client(groq_client, gemini_api_key=None):
+    """Groq first, then Gemini (if a key is configured) or a fallback Groq model."""
+    providers = [GroqProvider(groq_client)]
+    if gemini_api_key:
+        providers.append(OpenAICompatibleProvider("gemini", GEMINI_BASE_URL, gemini_api_key, GEMINI_MODEL))
+    elif GROQ_FALLBACK_MODEL:
+        providers.append(GroqProvider(groq_client, name="groq-fallback", model=GROQ_FALLBACK_MODEL))
+    return FailoverClient(providers)
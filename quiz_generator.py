@@ -2,11 +2,13 @@
 import json
 import streamlit as st
 
+from token_budget import fit_text
+
 
 def generate_quiz(notes_content: str, groq_client, num_questions: int = 5, 
                   difficulty: str = "medium", model: str = "llama-3.3-70b-versatile") -> dict:
     try:
-        limited = notes_content[:6000]
+        limited = fit_text(notes_content, model, 4000, limit=1500)
         prompt = f"""Based on the following notes, generate a quiz with exactly {num_questions} multiple-choice questions.
 Difficulty level: {difficulty}
 
@@ -0,0 +1,267 @@
+"""
+Rate Limiter module for EchoMind
+Process-wide admission control for Groq calls shared by every Streamlit session:
+token buckets for requests and tokens per minute per model, fair queuing across
+sessions, and retries that honour retry-after headers with jittered backoff.
+"""
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from token_budget import estimate_tokens, get_model_limits
+
+DEFAULT_RPM = 30
+MODEL_RPM = {
+    "whisper-large-v3": 20,
+}
+# Accounts on a paid tier can raise the per-minute request budget for every model
+GROQ_RPM_LIMIT = int(os.environ.get("GROQ_RPM_LIMIT", 0)) or None
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 4))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", 1.0))
+LLM_RETRY_MAX_DELAY = 60.0
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Per-thread callback run each time a call is admitted and about to be sent
+_send_hooks = threading.local()
+
+
+def set_send_hook(hook):
+    """
+    Run `hook()` on this thread whenever a call is admitted and about to be sent
+    (e.g. to start a latency clock after any wait in the limiter). The hook may
+    raise to abandon the call; its reserved tokens are returned. Pass None to clear.
+    """
+    _send_hooks.hook = hook
+
+
+def notify_send():
+    hook = getattr(_send_hooks, "hook", None)
+    if hook is not None:
+        hook()
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity`, refilled at `rate` per second."""
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount):
+        """Seconds until `amount` can be taken (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ModelLimiter:
+    """
+    Admission for one model. Waiting calls are served in order of how many calls
+    their session has already had, so one busy session cannot starve the others.
+    """
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.condition = threading.Condition()
+        self.queue = []
+        self.sequence = itertools.count()
+        self.served = defaultdict(int)
+        self.blocked_until = 0.0
+
+    def acquire(self, session, tokens):
+        with self.condition:
+            entry = (self.served[session], next(self.sequence), session)
+            heapq.heappush(self.queue, entry)
+            while True:
+                if self.queue[0] is entry:
+                    wait = max(
+                        self.blocked_until - time.monotonic(),
+                        self.requests.time_until(1),
+                        self.tokens.time_until(tokens),
+                    )
+                    if wait <= 0:
+                        break
+                else:
+                    wait = None
+                self.condition.wait(timeout=wait)
+            heapq.heappop(self.queue)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self.served[session] += 1
+            self.condition.notify_all()
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real usage of a call is known."""
+        with self.condition:
+            if actual < estimated:
+                self.tokens.refund(estimated - actual)
+            elif actual > estimated:
+                self.tokens.consume(actual - estimated)
+            self.condition.notify_all()
+
+    def block_for(self, seconds):
+        """Hold every call for this model, e.g. after the provider asked us to back off."""
+        with self.condition:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.condition.notify_all()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model):
+    """The shared limiter for `model`, created on first use."""
+    with _limiters_lock:
+        if model not in _limiters:
+            rpm = GROQ_RPM_LIMIT or MODEL_RPM.get(model, DEFAULT_RPM)
+            _limiters[model] = ModelLimiter(rpm, get_model_limits(model)["tpm"])
+        return _limiters[model]
+
+
+def _parse_duration(value):
+    """Parse retry-after style values: "7", "7.66s", "2m59.56s" or "120ms"."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matches = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    for number, unit in matches:
+        total += float(number) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matches else None
+
+
+def retry_after_seconds(error):
+    """Delay requested by the provider in a rate limit response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after", "x-ratelimit-reset-tokens", "x-ratelimit-reset-requests"):
+        seconds = _parse_duration(headers.get(header))
+        if seconds is not None:
+            return seconds
+    return None
+
+
+def is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    name = type(error).__name__
+    return "Connection" in name or "Timeout" in name
+
+
+def estimate_request_tokens(kwargs):
+    """Tokens a chat request counts against TPM: the prompt plus the requested max_tokens."""
+    prompt = " ".join(str(message.get("content") or "") for message in kwargs.get("messages") or [])
+    return estimate_tokens(prompt) + int(kwargs.get("max_tokens") or 1024)
+
+
+def call_with_limits(func, model, tokens, session="default", max_retries=LLM_MAX_RETRIES):
+    """
+    Admit the call through the shared limiter for `model`, then run it, retrying
+    rate limits and transient errors with jittered exponential backoff.
+    """
+    limiter = get_limiter(model)
+    attempt = 0
+    while True:
+        limiter.acquire(session, tokens)
+        try:
+            notify_send()
+        except Exception:
+            limiter.settle(tokens, 0)
+            raise
+        try:
+            result = func()
+        except Exception as e:
+            attempt += 1
+            if not is_retryable(e) or attempt > max_retries:
+                raise
+            delay = min(LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1), LLM_RETRY_MAX_DELAY) * random.uniform(0.5, 1.5)
+            requested = retry_after_seconds(e)
+            if requested is not None:
+                delay = max(delay, requested)
+                limiter.block_for(requested)
+            print(f"{model} call failed ({e}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        usage = getattr(result, "usage", None)
+        total_tokens = getattr(usage, "total_tokens", None)
+        if tokens and total_tokens is not None:
+            limiter.settle(tokens, total_tokens)
+        return result
+
+
+class _LimitedCompletions:
+    def __init__(self, completions, session):
+        self._completions = completions
+        self._session = session
+
+    def create(self, **kwargs):
+        return call_with_limits(
+            lambda: self._completions.create(**kwargs),
+            kwargs.get("model"), estimate_request_tokens(kwargs), self._session,
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class _LimitedTranscriptions:
+    def __init__(self, transcriptions, session):
+        self._transcriptions = transcriptions
+        self._session = session
+
+    def create(self, **kwargs):
+        # Whisper is limited by requests and audio length, not chat tokens
+        return call_with_limits(lambda: self._transcriptions.create(**kwargs), kwargs.get("model"), 0, self._session)
+
+    def __getattr__(self, name):
+        return getattr(self._transcriptions, name)
+
+
+class _Namespace:
+    def __init__(self, wrapped, **attributes):
+        self._wrapped = wrapped
+        self.__dict__.update(attributes)
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+
+class RateLimitedClient:
+    """
+    Drop-in wrapper around a Groq client that sends chat and transcription calls
+    through the process-wide limiter on behalf of one session.
+    """
+    def __init__(self, client, session="default"):
+        self._client = client
+        self.session = session
+        self.chat = _Namespace(client.chat, completions=_LimitedCompletions(client.chat.completions, session))
+        self.audio = _Namespace(client.audio, transcriptions=_LimitedTranscriptions(client.audio.transcriptions, session))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
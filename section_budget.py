@@ -0,0 +1,118 @@
+"""
+Section Budget module for EchoMind
+Sizes the max_tokens of each note section from its outline description, its
+share of the transcript and the note style, and calibrates the estimate against
+the output lengths of past sections stored in SQLite. Smaller reservations leave
+more of the shared tokens-per-minute quota for concurrent generations.
+"""
+import os
+import sqlite3
+import time
+
+from token_budget import estimate_tokens
+
+SECTION_MIN_OUTPUT_TOKENS = int(os.environ.get("SECTION_MIN_OUTPUT_TOKENS", 400))
+SECTION_MAX_OUTPUT_TOKENS = int(os.environ.get("SECTION_MAX_OUTPUT_TOKENS", 8000))
+SECTION_BASE_TOKENS = 300
+DESCRIPTION_TOKEN_FACTOR = 3.0
+SOURCE_TOKEN_FACTOR = 0.25
+# Relative output length of each note style
+STYLE_OUTPUT_FACTORS = {
+    "exam_ready": 0.6,
+    "detailed": 1.0,
+    "with_examples": 1.5,
+}
+# Calibration uses the recent actual/estimated ratios of the same model and style
+HISTORY_WINDOW = 50
+HISTORY_MIN_SAMPLES = 5
+HISTORY_PERCENTILE = 90
+HEADROOM = 1.2
+# Until HISTORY_MIN_SAMPLES sections have been recorded the estimate is uncalibrated, so allow more
+UNCALIBRATED_RATIO = 2.0
+# A section that used its whole allowance was cut off; count it as longer than it was
+TRUNCATED_RATIO_BOOST = 1.5
+
+
+def init_section_history(db_path):
+    """Create the section_output_history table if needed"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS section_output_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model TEXT NOT NULL,
+            note_style TEXT NOT NULL,
+            estimated_tokens INTEGER NOT NULL,
+            max_tokens INTEGER NOT NULL,
+            output_tokens INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_section_history_model_style ON section_output_history(model, note_style, id)')
+    conn.commit()
+    conn.close()
+
+
+def estimate_section_output(description, source_tokens, note_style="detailed"):
+    """Uncalibrated output estimate for one section, in tokens."""
+    base = SECTION_BASE_TOKENS + DESCRIPTION_TOKEN_FACTOR * estimate_tokens(description) + SOURCE_TOKEN_FACTOR * source_tokens
+    return int(base * STYLE_OUTPUT_FACTORS.get(note_style, STYLE_OUTPUT_FACTORS["detailed"]))
+
+
+class SectionBudget:
+    """
+    Output allowances for the sections of one generation run. The calibration
+    ratio is read once when the run starts; every finished section is recorded
+    so later runs size their sections from real output lengths.
+    """
+    def __init__(self, db_path, model, note_style="detailed"):
+        self.db_path = db_path
+        self.model = model
+        self.note_style = note_style
+        self.ratio = UNCALIBRATED_RATIO
+        try:
+            init_section_history(db_path)
+            self.ratio = self._load_ratio()
+        except Exception as e:
+            print(f"Section output history unavailable: {e}")
+
+    def _load_ratio(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        c = conn.cursor()
+        c.execute('''
+            SELECT estimated_tokens, max_tokens, output_tokens FROM section_output_history
+            WHERE model = ? AND note_style = ?
+            ORDER BY id DESC LIMIT ?
+        ''', (self.model, self.note_style, HISTORY_WINDOW))
+        rows = c.fetchall()
+        conn.close()
+        if len(rows) < HISTORY_MIN_SAMPLES:
+            return UNCALIBRATED_RATIO
+        ratios = []
+        for estimated, max_tokens, output in rows:
+            ratio = output / max(estimated, 1)
+            if output >= max_tokens:
+                ratio *= TRUNCATED_RATIO_BOOST
+            ratios.append(ratio)
+        ratios.sort()
+        return ratios[min(int(round(HISTORY_PERCENTILE / 100.0 * (len(ratios) - 1))), len(ratios) - 1)]
+
+    def allowance(self, description, source_tokens):
+        """Return (estimated_tokens, max_tokens) for a section."""
+        estimated = estimate_section_output(description, source_tokens, self.note_style)
+        max_tokens = int(estimated * self.ratio * HEADROOM)
+        return estimated, max(SECTION_MIN_OUTPUT_TOKENS, min(max_tokens, SECTION_MAX_OUTPUT_TOKENS))
+
+    def record(self, estimated, max_tokens, output_tokens):
+        """Store the real output length of a finished section."""
+        try:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            c = conn.cursor()
+            c.execute('''
+                INSERT INTO section_output_history (model, note_style, estimated_tokens, max_tokens, output_tokens, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (self.model, self.note_style, estimated, max_tokens, output_tokens, time.time()))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error recording section output: {e}")
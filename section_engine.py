@@ -0,0 +1,67 @@
+"""
+Section Engine module for EchoMind
+Generates note sections concurrently on a bounded thread pool while the
+Streamlit script thread keeps streaming each section's tokens into its own
+placeholder as they arrive.
+"""
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+SECTION_CONCURRENCY = int(os.environ.get("SECTION_CONCURRENCY", 4))
+
+_DONE = object()
+
+
+def flatten_section_jobs(structure):
+    """Turn a nested notes structure into an ordered list of (title, description) leaf sections."""
+    jobs = []
+    for title, content in structure.items():
+        if isinstance(content, str):
+            jobs.append((title, content))
+        elif isinstance(content, dict):
+            jobs.extend(flatten_section_jobs(content))
+    return jobs
+
+
+def run_sections_concurrently(jobs, generate, on_token, on_statistics=lambda stats: None,
+                              on_error=lambda title, error: None, on_done=lambda title: None,
+                              max_workers=SECTION_CONCURRENCY):
+    """
+    Run `generate(title, description)` for every job with at most `max_workers` in flight.
+    `generate` is called on a worker thread when the job starts and returns an iterator of
+    token strings and statistics objects.
+    Callbacks are invoked on the calling thread only, so they may update Streamlit elements:
+    `on_token(title, text)`, `on_statistics(stats)`, `on_error(title, exception)` and
+    `on_done(title)` once a section has finished.
+    """
+    if not jobs:
+        return
+    events = queue.Queue()
+
+    def work(title, description):
+        try:
+            for item in generate(title, description):
+                events.put((title, item))
+        except Exception as e:
+            events.put((title, e))
+        finally:
+            events.put((title, _DONE))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        for title, description in jobs:
+            executor.submit(work, title, description)
+
+        remaining = len(jobs)
+        while remaining:
+            title, item = events.get()
+            if item is _DONE:
+                remaining -= 1
+                on_done(title)
+            elif isinstance(item, Exception):
+                print(f"Section '{title}' failed: {item}")
+                on_error(title, item)
+            elif isinstance(item, str):
+                on_token(title, item)
+            elif item is not None:
+                on_statistics(item)
@@ -4,10 +4,12 @@ Sentiment Analysis module for EchoMind.
 import json
 import re
 
+from token_budget import fit_text
+
 def analyze_sentiment_with_groq(text: str, groq_client, model: str = "llama-3.3-70b-versatile") -> dict:
     """Analyze sentiment using Groq LLM"""
     try:
-        limited_text = text[:6000]
+        limited_text = fit_text(text, model, 2000, limit=1500)
         
         prompt = f"""Analyze the sentiment and emotional tone of the following text. Provide:
 1. Overall sentiment (positive, negative, neutral, mixed)
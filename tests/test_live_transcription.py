@@ -0,0 +1,24 @@
+"""LiveTranscriber lifecycle: a discarded transcriber releases its pool and files."""
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import numpy as np
+
+from audio_processing import AUDIO_SAMPLE_RATE
+from live_transcription import LiveTranscriber
+
+
+def test_discard_removes_work_dir_and_ignores_late_audio():
+    transcriber = LiveTranscriber(groq_client=None, language="en")
+    transcriber.add_audio(np.zeros(AUDIO_SAMPLE_RATE, dtype=np.float32))
+    assert transcriber.has_audio()
+
+    transcriber.discard()
+    assert not os.path.exists(transcriber.work_dir)
+    assert transcriber.executor._shutdown
+    # The capture thread may still deliver frames after the switch
+    transcriber.add_audio(np.zeros(AUDIO_SAMPLE_RATE, dtype=np.float32))
+    assert not transcriber.has_audio()
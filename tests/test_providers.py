@@ -0,0 +1,215 @@
+"""FailoverClient and OpenAICompatibleProvider against local stand-in HTTP servers."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import providers
+from providers import FailoverClient, GroqProvider, OpenAICompatibleProvider
+from rate_limiter import RateLimitedClient, get_limiter
+
+
+def _completion(text):
+    return {
+        "id": "test",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+    }
+
+
+def _chunk(text):
+    return "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": text}}]}) + "\n\n"
+
+
+class StandIn:
+    """
+    A local chat completions server. The first path segment picks the behaviour:
+    /ok, /fail, /slow (answers after `delay`), /stream, /slowstream (first token after `delay`).
+    """
+    def __init__(self, delay=1.0):
+        self.delay = delay
+        self.requests = []
+        self.disconnected = threading.Event()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                mode = self.path.strip("/").split("/")[0]
+                stand_in.requests.append((mode, body))
+                if mode == "fail":
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                if mode in ("ok", "slow"):
+                    if mode == "slow":
+                        time.sleep(stand_in.delay)
+                    data = json.dumps(_completion(f"from {mode}")).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                if mode == "slowstream":
+                    time.sleep(stand_in.delay)
+                try:
+                    # Keep streaming until the client hangs up (or a few seconds pass)
+                    for index in range(100 if mode == "slowstream" else 3):
+                        self.wfile.write(_chunk(f"{mode}{index} ").encode())
+                        self.wfile.flush()
+                        time.sleep(0.05 if mode == "slowstream" else 0)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    stand_in.disconnected.set()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, mode):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/{mode}"
+
+    def provider(self, mode, name=None):
+        return OpenAICompatibleProvider(name or mode, self.url(mode), "test-key", f"model-{mode}")
+
+    def modes(self):
+        return [mode for mode, _ in self.requests]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def fast_hedging(monkeypatch):
+    monkeypatch.setattr(providers, "HEDGE_DEFAULT_SECONDS", 0.2)
+    monkeypatch.setattr(providers, "HEDGE_MIN_SECONDS", 0.1)
+
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def _stream_text(chunks):
+    return "".join(chunk.choices[0].delta.content or "" for chunk in chunks)
+
+
+def test_provider_returns_completion_with_groq_usage_fields(stand_in):
+    completion = stand_in.provider("ok").create(model="ignored", messages=MESSAGES)
+    assert completion.choices[0].message.content == "from ok"
+    assert completion.usage.total_tokens == 7
+    assert completion.usage.total_time >= 0
+    assert stand_in.requests[0][1]["model"] == "ignored"
+
+
+def test_provider_streams_server_sent_events(stand_in):
+    chunks = list(stand_in.provider("stream").create(model="m", messages=MESSAGES, stream=True))
+    assert _stream_text(chunks) == "stream0 stream1 stream2 "
+    assert all(chunk.x_groq is None for chunk in chunks)
+
+
+def test_failover_to_next_provider_on_error(stand_in):
+    client = FailoverClient([stand_in.provider("fail"), stand_in.provider("ok")])
+    completion = client.chat.completions.create(model="m", messages=MESSAGES)
+    assert completion.choices[0].message.content == "from ok"
+    assert client.breakers["fail"].consecutive_failures == 1
+    assert stand_in.modes() == ["fail", "ok"]
+
+
+def test_failover_raises_last_error_when_every_provider_fails(stand_in):
+    client = FailoverClient([stand_in.provider("fail", "a"), stand_in.provider("fail", "b")])
+    with pytest.raises(Exception):
+        client.chat.completions.create(model="m", messages=MESSAGES)
+    assert stand_in.modes() == ["fail", "fail"]
+
+
+def test_slow_stream_is_hedged_and_loser_is_closed(stand_in, fast_hedging):
+    client = FailoverClient([stand_in.provider("slowstream"), stand_in.provider("stream")])
+    started = time.monotonic()
+    text = _stream_text(client.chat.completions.create(model="m", messages=MESSAGES, stream=True))
+    assert text == "stream0 stream1 stream2 "
+    assert time.monotonic() - started < stand_in.delay
+    assert stand_in.modes() == ["slowstream", "stream"]
+    # The slow stream is closed as soon as its first token arrives
+    assert stand_in.disconnected.wait(timeout=5)
+
+
+def test_non_streaming_calls_are_not_hedged(stand_in, fast_hedging):
+    stand_in.delay = 0.5
+    client = FailoverClient([stand_in.provider("slow"), stand_in.provider("ok")])
+    completion = client.chat.completions.create(model="m", messages=MESSAGES)
+    assert completion.choices[0].message.content == "from slow"
+    assert stand_in.modes() == ["slow"]
+
+
+def test_hedge_clock_starts_when_the_request_is_sent(stand_in, fast_hedging, monkeypatch):
+    # Simulate a long wait in the rate limiter before the request goes out
+    original = OpenAICompatibleProvider._stream
+
+    def queued_stream(self, payload):
+        time.sleep(0.5)
+        yield from original(self, payload)
+
+    monkeypatch.setattr(OpenAICompatibleProvider, "_stream", queued_stream)
+    client = FailoverClient([stand_in.provider("stream"), stand_in.provider("stream", "backup")])
+    text = _stream_text(client.chat.completions.create(model="m", messages=MESSAGES, stream=True))
+    assert text == "stream0 stream1 stream2 "
+    assert stand_in.modes() == ["stream"]
+
+
+class FakeGroq:
+    """Stands in for the Groq SDK client: streams three chunks and records each call."""
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+        self.chat = SimpleNamespace(completions=self)
+        self.audio = SimpleNamespace(transcriptions=None)
+
+    def create(self, **kwargs):
+        self.calls.append(self.name)
+        return iter([
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=f"{self.name}{index} "))], x_groq=None)
+            for index in range(3)
+        ])
+
+
+def test_hedge_clock_waits_for_the_rate_limiter(fast_hedging):
+    calls = []
+    model = "test-limited-model"
+    get_limiter(model).block_for(1.0)
+    client = FailoverClient([
+        GroqProvider(RateLimitedClient(FakeGroq("primary", calls))),
+        GroqProvider(FakeGroq("backup", calls), name="backup"),
+    ])
+    started = time.monotonic()
+    text = _stream_text(client.chat.completions.create(model=model, messages=MESSAGES, stream=True))
+    assert text == "primary0 primary1 primary2 "
+    assert calls == ["primary"]
+    assert time.monotonic() - started >= 0.9
+
+
+def test_latency_is_tracked_per_prompt_size(stand_in):
+    client = FailoverClient([stand_in.provider("ok")])
+    client.chat.completions.create(model="m", messages=MESSAGES)
+    client.chat.completions.create(model="m", messages=[{"role": "user", "content": "word " * 3000}])
+    buckets = {key[3] for key in client.latencies}
+    assert len(buckets) == 2
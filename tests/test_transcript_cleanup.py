@@ -0,0 +1,71 @@
+"""Cleanup must only remove speech noise, never content."""
+import pytest
+
+from transcript_cleanup import clean_transcript, collapse_repeats
+
+
+def clean(text, language="en"):
+    return clean_transcript(text, language)["text"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("diff- different approaches", "different approaches"),
+    ("I- I think so", "I think so"),
+    ("a well- known result", "a well- known result"),
+    ("from 5- 10 people", "from 5- 10 people"),
+    ("pre- and post-war", "pre- and post-war"),
+])
+def test_false_starts_only_drop_restarted_fragments(text, expected):
+    assert clean(text) == expected
+
+
+def test_english_stutters_and_fillers_are_removed():
+    assert clean("I I think, um, the the model works") == "I think, the model works"
+
+
+@pytest.mark.parametrize("text", [
+    "I know that that works",
+    "it was so so good",
+    "things got better day day after",
+    "thank you, bye bye",
+])
+def test_legitimate_doubles_are_kept(text):
+    assert clean(text) == text
+
+
+def test_hindi_reduplication_is_kept():
+    text = "धीरे धीरे सब ठीक हो गया, बहुत बहुत धन्यवाद"
+    assert clean(text, language="hi") == text
+
+
+def test_auto_detected_hindi_reduplication_is_kept():
+    text = "धीरे धीरे सब ठीक हो गया, बहुत बहुत धन्यवाद"
+    assert clean(text, language="auto") == text
+
+
+def test_auto_detected_portuguese_keeps_um():
+    text = "Eu comprei um livro e um caderno"
+    assert clean(text, language="auto") == text
+
+
+def test_auto_detected_english_is_cleaned():
+    assert clean("so I I think, um, the the model works", language="auto") == "so I think, the model works"
+
+
+def test_hindi_loops_are_still_collapsed():
+    assert clean("अच्छा अच्छा अच्छा अच्छा ठीक है", language="hi") == "अच्छा ठीक है"
+
+
+def test_phrase_loops_are_collapsed_in_any_language():
+    assert collapse_repeats("thank you thank you thank you so much".split()) == "thank you so much".split()
+    assert clean("merci beaucoup merci beaucoup merci beaucoup", language="fr") == "merci beaucoup"
+
+
+def test_doubled_phrases_are_kept():
+    assert clean("we went back and forth back and forth") == "we went back and forth back and forth"
+
+
+def test_savings_are_reported():
+    result = clean_transcript("um um the the the result")
+    assert result["text"] == "the result"
+    assert result["tokens_saved"] == result["tokens_before"] - result["tokens_after"] > 0
@@ -0,0 +1,36 @@
+"""Time and text lookups on the transcript store, before and after cleanup rebasing."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from transcript_cleanup import clean_transcript
+from transcript_store import TranscriptSegments, load_transcript_store
+
+SEGMENTS = [
+    {"start": 0.0, "end": 5.0, "text": "Welcome, um, to the the course."},
+    {"start": 5.0, "end": 10.0, "text": "Today we cover gradient descent."},
+    {"start": 10.0, "end": 15.0, "text": "Then we move on to questions."},
+]
+
+
+def test_slice_by_time_returns_overlapping_segments():
+    store = TranscriptSegments.from_segments(SEGMENTS)
+    assert store.slice_by_time(5.0, 10.0) == "Today we cover gradient descent."
+    assert store.slice_by_time(7.0, 12.0) == "Today we cover gradient descent. Then we move on to questions."
+    assert store.slice_by_time(20.0, 30.0) == ""
+
+
+def test_rebased_store_slices_and_searches_the_cleaned_text():
+    store = TranscriptSegments.from_segments(SEGMENTS)
+    cleaned = clean_transcript(store.text, "en")["text"]
+    rebased = store.rebase(cleaned)
+    assert rebased.slice_by_time(0.0, 5.0) == "Welcome, to the course."
+    assert rebased.slice_by_time(10.0, 15.0) == "Then we move on to questions."
+    assert rebased.find_time("gradient descent") == 5.0
+
+
+def test_blob_round_trip():
+    store = TranscriptSegments.from_segments(SEGMENTS)
+    loaded = load_transcript_store(store.to_blob())
+    assert loaded.text == store.text
+    assert loaded.slice_by_time(10.0, 15.0) == "Then we move on to questions."
@@ -0,0 +1,119 @@
+"""
+Token Budget module for EchoMind
+Script-aware token estimates and per-model prompt budgets, so prompts are sized
+in tokens rather than characters and long inputs are truncated, chunked or
+map-reduced before they hit context or tokens-per-minute limits.
+"""
+import os
+import re
+
+# Context window and free-tier tokens-per-minute for the models EchoMind uses.
+# A single request (prompt + max_tokens) must fit in both.
+MODEL_LIMITS = {
+    "llama-3.3-70b-versatile": {"context": 131072, "tpm": 12000},
+    "llama-3.1-8b-instant": {"context": 131072, "tpm": 6000},
+    "meta-llama/llama-4-scout-17b-16e-instruct": {"context": 131072, "tpm": 30000},
+    "meta-llama/llama-4-maverick-17b-128e-instruct": {"context": 131072, "tpm": 6000},
+}
+DEFAULT_MODEL_LIMITS = {"context": 8192, "tpm": 6000}
+# Accounts on a paid tier can raise the per-minute budget for every model
+GROQ_TPM_LIMIT = int(os.environ.get("GROQ_TPM_LIMIT", 0)) or None
+# Room for system prompt, instructions and examples around the text being sized
+PROMPT_OVERHEAD_TOKENS = 800
+ESTIMATE_SAFETY = 1.1
+
+# Characters per token by script; Indic scripts and CJK take far more tokens per character than English
+DEVANAGARI_PATTERN = re.compile(r"[ऀ-ॿ]")
+CJK_PATTERN = re.compile(r"[　-鿿가-힯]")
+OTHER_NON_ASCII_PATTERN = re.compile(r"[^\x00-\x7fऀ-ॿ　-鿿가-힯]")
+ASCII_CHARS_PER_TOKEN = 4.0
+DEVANAGARI_CHARS_PER_TOKEN = 1.5
+CJK_CHARS_PER_TOKEN = 1.0
+OTHER_CHARS_PER_TOKEN = 2.0
+
+
+def estimate_tokens(text):
+    """Estimate the token count of `text`, accounting for the script it is written in."""
+    if not text:
+        return 0
+    devanagari = len(DEVANAGARI_PATTERN.findall(text))
+    cjk = len(CJK_PATTERN.findall(text))
+    other = len(OTHER_NON_ASCII_PATTERN.findall(text))
+    ascii_chars = len(text) - devanagari - cjk - other
+    tokens = (
+        ascii_chars / ASCII_CHARS_PER_TOKEN
+        + devanagari / DEVANAGARI_CHARS_PER_TOKEN
+        + cjk / CJK_CHARS_PER_TOKEN
+        + other / OTHER_CHARS_PER_TOKEN
+    )
+    return int(tokens * ESTIMATE_SAFETY) + 1
+
+
+def get_model_limits(model):
+    limits = dict(MODEL_LIMITS.get(model, DEFAULT_MODEL_LIMITS))
+    if GROQ_TPM_LIMIT:
+        limits["tpm"] = GROQ_TPM_LIMIT
+    return limits
+
+
+def input_budget(model, max_output_tokens, overhead=PROMPT_OVERHEAD_TOKENS):
+    """Tokens left for the variable part of a prompt once output and overhead are reserved."""
+    limits = get_model_limits(model)
+    return max(min(limits["context"], limits["tpm"]) - max_output_tokens - overhead, 256)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut `text` at a word boundary so it fits in `max_tokens`."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text.rfind(" ", 0, low)
+    return text[:cut if cut > low // 2 else low].rstrip()
+
+
+def split_by_tokens(text, max_tokens):
+    """Split `text` at word boundaries into consecutive pieces of at most `max_tokens` each."""
+    pieces = []
+    current = []
+    current_tokens = 0
+    for word in text.split():
+        word_tokens = estimate_tokens(word + " ")
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def plan_prompt(text, model, max_output_tokens, limit=None, fallback="truncate", overhead=PROMPT_OVERHEAD_TOKENS):
+    """
+    Decide how `text` goes into a prompt for `model`.
+    `limit` caps the tokens a task needs even when the model could take more.
+    `fallback` says how the task copes with too much text: "truncate" keeps the start,
+    "chunk" runs the task on independent pieces, "map_reduce" condenses the pieces
+    before a final pass.
+    Returns {"strategy": "full" | fallback, "tokens", "budget", "chunks": list of texts}.
+    """
+    budget = input_budget(model, max_output_tokens, overhead)
+    if limit:
+        budget = min(budget, limit)
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return {"strategy": "full", "tokens": tokens, "budget": budget, "chunks": [text]}
+    if fallback == "truncate":
+        return {"strategy": "truncate", "tokens": tokens, "budget": budget, "chunks": [truncate_to_tokens(text, budget)]}
+    return {"strategy": fallback, "tokens": tokens, "budget": budget, "chunks": split_by_tokens(text, budget)}
+
+
+def fit_text(text, model, max_output_tokens, limit=None):
+    """`text`, truncated if needed so the request fits the model's budget."""
+    return plan_prompt(text, model, max_output_tokens, limit=limit)["chunks"][0]
@@ -0,0 +1,117 @@
+"""
+Transcript Cleanup module for EchoMind
+Deterministic local pass over a transcript before it is sent to any model:
+normalizes whitespace, drops filler words and stutters, and collapses the
+repeated phrase loops Whisper sometimes produces. The transcript goes into the
+title, speaker, outline and every section prompt, so savings compound.
+"""
+import os
+import re
+
+from token_budget import estimate_tokens
+
+TRANSCRIPT_CLEANUP = os.environ.get("TRANSCRIPT_CLEANUP", "1") != "0"
+# Longest phrase (in words) checked for repetition loops
+LOOP_MAX_NGRAM = 20
+# A phrase repeated this many times in a row is a loop and is kept once
+LOOP_MIN_REPEATS = 3
+# A single English word repeated this many times in a row is a stutter ("I I think").
+# Other languages double words on purpose (Hindi "dheere dheere"), so only loops are collapsed there.
+STUTTER_MIN_REPEATS = 2
+# Words that are legitimately doubled in normal speech ("I know that that works")
+KEEP_DOUBLED = {
+    "that", "had", "is", "very", "really", "no", "bye", "ha", "so", "day", "now", "well",
+    "yes", "yeah", "okay", "ok", "oh", "hey", "more", "much", "many", "long", "far", "again",
+    "over", "little", "bit", "one", "two", "knock", "blah", "tick", "chop",
+}
+
+# Common English function words; with language "auto" a transcript is treated as English
+# only when they make up at least ENGLISH_MIN_SHARE of its words
+ENGLISH_HINT_WORDS = {
+    "the", "and", "a", "an", "to", "of", "in", "is", "it", "that", "this", "i", "you", "we",
+    "they", "was", "are", "for", "on", "with", "so", "but", "be", "have", "not", "what", "there",
+}
+ENGLISH_MIN_SHARE = 0.15
+
+# Fillers are only removed for English speech; elsewhere these spellings can be real words (Portuguese "um")
+FILLER_PATTERN = re.compile(r"(?i)(?<![\w-])(?:u+m+|u+h+|e+r+m+|h+m+|m+h+m+)(?![\w-])[,.]?\s*")
+# A word cut off mid-way and restarted, e.g. "diff- different". The next word must start with
+# the fragment, so "a well- known result" and "from 5- 10 people" are left alone.
+FALSE_START_PATTERN = re.compile(r"(?i)(?<![\w-])([^\W\d_]+)-\s+(?=\1)")
+SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+([,.!?;:])")
+REPEATED_PUNCTUATION = re.compile(r"([,;:])\s*(?=[,.!?;:])")
+LEADING_PUNCTUATION = re.compile(r"^[\s,;:]+")
+HORIZONTAL_SPACE = re.compile(r"[ \t\r\f\v]+")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+WORD_KEY_PATTERN = re.compile(r"[^\w]+")
+
+
+def _word_key(word):
+    return WORD_KEY_PATTERN.sub("", word.lower())
+
+
+def collapse_repeats(words, max_ngram=LOOP_MAX_NGRAM, min_repeats=LOOP_MIN_REPEATS, stutter_min_repeats=STUTTER_MIN_REPEATS):
+    """
+    Collapse phrases repeated back to back into a single occurrence.
+    Single words need `stutter_min_repeats` repeats (KEEP_DOUBLED words are never
+    collapsed), longer phrases `min_repeats`.
+    The shortest repeating phrase at each position wins, so "a b a b a b" becomes "a b".
+    The last occurrence is kept so trailing punctuation survives.
+    """
+    keys = [_word_key(word) for word in words]
+    collapsed = []
+    i = 0
+    while i < len(words):
+        match = None
+        for n in range(1, min(max_ngram, (len(words) - i) // 2) + 1):
+            phrase = keys[i:i + n]
+            if not any(phrase) or (n == 1 and phrase[0] in KEEP_DOUBLED):
+                continue
+            repeats = 1
+            while keys[i + repeats * n:i + (repeats + 1) * n] == phrase:
+                repeats += 1
+            if repeats >= (stutter_min_repeats if n == 1 else min_repeats):
+                match = (n, repeats)
+                break
+        if match:
+            n, repeats = match
+            collapsed.extend(words[i + (repeats - 1) * n:i + repeats * n])
+            i += n * repeats
+        else:
+            collapsed.append(words[i])
+            i += 1
+    return collapsed
+
+
+def looks_english(text):
+    """Whether English function words make up a typical share of `text`."""
+    keys = [_word_key(word) for word in text.split()]
+    return bool(keys) and sum(key in ENGLISH_HINT_WORDS for key in keys) / len(keys) >= ENGLISH_MIN_SHARE
+
+
+def _clean_paragraph(paragraph, english):
+    paragraph = HORIZONTAL_SPACE.sub(" ", paragraph.replace("\n", " ")).strip()
+    if english:
+        paragraph = FILLER_PATTERN.sub("", paragraph)
+    paragraph = FALSE_START_PATTERN.sub("", paragraph)
+    stutter_min_repeats = STUTTER_MIN_REPEATS if english else LOOP_MIN_REPEATS
+    paragraph = " ".join(collapse_repeats(paragraph.split(), stutter_min_repeats=stutter_min_repeats))
+    paragraph = SPACE_BEFORE_PUNCTUATION.sub(r"\1", paragraph)
+    paragraph = REPEATED_PUNCTUATION.sub("", paragraph)
+    return LEADING_PUNCTUATION.sub("", paragraph)
+
+
+def clean_transcript(text, language="en"):
+    """
+    Clean a transcript and report the saving. English-only rules (fillers, doubled
+    word stutters) apply for "en", and for "auto" when the text looks English.
+    Returns {"text", "tokens_before", "tokens_after", "tokens_saved"}.
+    """
+    tokens_before = estimate_tokens(text)
+    if not text or not TRANSCRIPT_CLEANUP:
+        return {"text": text, "tokens_before": tokens_before, "tokens_after": tokens_before, "tokens_saved": 0}
+    english = language == "en" or (language == "auto" and looks_english(text))
+    paragraphs = (_clean_paragraph(paragraph, english) for paragraph in PARAGRAPH_BREAK.split(text))
+    cleaned = "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
+    tokens_after = estimate_tokens(cleaned)
+    return {"text": cleaned, "tokens_before": tokens_before, "tokens_after": tokens_after, "tokens_saved": tokens_before - tokens_after}
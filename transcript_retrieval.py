@@ -0,0 +1,118 @@
+"""
+Transcript Retrieval module for EchoMind
+Splits long transcripts into overlapping passages and ranks them with BM25 in
+NumPy, so each note section is written from the passages relevant to it rather
+than from the whole transcript.
+"""
+import os
+import re
+
+from token_budget import estimate_tokens
+
+# NumPy is optional; without it every section gets the full transcript
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Transcripts estimated below this many tokens are sent whole
+RETRIEVAL_MIN_TOKENS = int(os.environ.get("RETRIEVAL_MIN_TOKENS", 3000))
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 6))
+PASSAGE_WORDS = 200
+PASSAGE_OVERLAP_WORDS = 40
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# \w misses Devanagari vowel signs, which would split Hindi and Marathi words apart
+TOKEN_PATTERN = re.compile(r"[\wऀ-ॿ]+")
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 or not token.isascii()]
+
+
+def split_passages(transcript, passage_words=PASSAGE_WORDS, overlap=PASSAGE_OVERLAP_WORDS):
+    """Split a transcript into overlapping word windows, in order."""
+    words = transcript.split()
+    step = max(passage_words - overlap, 1)
+    passages = []
+    for start in range(0, len(words), step):
+        passages.append(" ".join(words[start:start + passage_words]))
+        if start + passage_words >= len(words):
+            break
+    return passages
+
+
+class TranscriptIndex:
+    """BM25 index over the passages of one transcript."""
+    def __init__(self, transcript, passage_words=PASSAGE_WORDS, overlap=PASSAGE_OVERLAP_WORDS):
+        self.passages = split_passages(transcript, passage_words, overlap)
+        self.passage_words = passage_words
+        self.step = max(passage_words - overlap, 1)
+        tokenized = [tokenize(passage) for passage in self.passages]
+        self.vocabulary = {}
+        for tokens in tokenized:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        counts = np.zeros((len(self.passages), len(self.vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(tokenized):
+            np.add.at(counts[row], [self.vocabulary[token] for token in tokens], 1.0)
+
+        lengths = counts.sum(axis=1, keepdims=True)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+        document_frequency = (counts > 0).sum(axis=0)
+        self.idf = np.log(1.0 + (len(self.passages) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        # Term weights are precomputed so a query is a single column sum
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / max(average_length, 1.0))
+        self.weights = counts * (BM25_K1 + 1.0) / (counts + norm)
+
+    def score(self, query):
+        """BM25 score of every passage for `query`."""
+        columns = [self.vocabulary[token] for token in set(tokenize(query)) if token in self.vocabulary]
+        if not columns:
+            return np.zeros(len(self.passages), dtype=np.float32)
+        return self.weights[:, columns] @ self.idf[columns]
+
+    def passages_in(self, start_word, end_word):
+        """Indexes of the passages that overlap words [start_word, end_word) of the transcript."""
+        first = max(start_word - self.passage_words, -1) // self.step + 1
+        return [i for i in range(max(first, 0), len(self.passages)) if i * self.step < end_word]
+
+    def context_for(self, query, top_k=RETRIEVAL_TOP_K, candidates=None):
+        """
+        The `top_k` best passages for `query`, joined in transcript order.
+        `candidates` limits the ranking to those passage indexes.
+        Falls back to the opening passages when nothing in the query matches.
+        """
+        scores = self.score(query)
+        pool = np.arange(len(self.passages)) if not candidates else np.array(sorted(set(candidates)))
+        if not scores[pool].any():
+            selected = [int(i) for i in pool[:top_k]]
+        else:
+            ranked = pool[np.argsort(-scores[pool], kind="stable")[:top_k]]
+            selected = sorted(int(i) for i in ranked if scores[i] > 0)
+        return "\n\n[...]\n\n".join(self.passages[i] for i in selected)
+
+
+def window_word_ranges(windows):
+    """Word ranges [start, end) of consecutive windows that split one transcript at word boundaries."""
+    ranges = []
+    start = 0
+    for window in windows:
+        end = start + len(window.split())
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def build_transcript_index(transcript, min_tokens=RETRIEVAL_MIN_TOKENS):
+    """Return a TranscriptIndex for long transcripts, or None when the full text should be used."""
+    if not NUMPY_AVAILABLE or not transcript or estimate_tokens(transcript) <= min_tokens:
+        return None
+    index = TranscriptIndex(transcript)
+    if len(index.passages) <= RETRIEVAL_TOP_K:
+        return None
+    return index
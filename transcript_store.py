@@ -0,0 +1,168 @@
+"""
+Transcript Store module for EchoMind
+Compact, timestamped transcript: one text buffer plus NumPy arrays of segment
+start/end times and character offsets, so any position in the text can be mapped
+to audio time (and back) with a binary search instead of re-scanning strings.
+"""
+import re
+from io import BytesIO
+
+# NumPy is optional; without it only the plain transcript text is kept
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+WORD_PATTERN = re.compile(r"\S+")
+KEY_PATTERN = re.compile(r"[^\w]+")
+# How far ahead in the original text a word of the rebased text is looked for
+ALIGN_LOOKAHEAD_WORDS = 64
+
+
+def _word_key(word):
+    return KEY_PATTERN.sub("", word.lower())
+
+
+def align_words(source_text, target_text, lookahead=ALIGN_LOOKAHEAD_WORDS):
+    """
+    Match the words of `target_text` (an edited copy of `source_text`, e.g. after
+    cleanup removed fillers and repeats) to words of `source_text` in order.
+    Returns a list of (target_offset, source_offset) character offsets.
+    Target words with no match within `lookahead` source words are skipped.
+    """
+    source = [(m.start(), _word_key(m.group())) for m in WORD_PATTERN.finditer(source_text)]
+    pairs = []
+    position = 0
+    for match in WORD_PATTERN.finditer(target_text):
+        key = _word_key(match.group())
+        for index in range(position, min(position + lookahead, len(source))):
+            if source[index][1] == key:
+                pairs.append((match.start(), source[index][0]))
+                position = index + 1
+                break
+    return pairs
+
+
+class TranscriptSegments:
+    """
+    Whisper (or caption) segments stored column-wise.
+    `text` is the segments joined by single spaces; segment i occupies
+    text[char_offsets[i]:char_offsets[i] + lengths[i]] and spans starts[i]..ends[i] seconds.
+    """
+    def __init__(self, text, starts, ends, char_offsets, lengths):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.char_offsets = char_offsets
+        self.lengths = lengths
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build the store from a list of {"start", "end", "text"} dicts."""
+        texts = [(segment.get("text") or "").strip() for segment in segments]
+        lengths = np.array([len(t) for t in texts], dtype=np.int64)
+        # Every segment after the first is preceded by one joining space
+        offsets = np.concatenate(([0], np.cumsum(lengths[:-1] + 1))) if len(lengths) else np.zeros(0, dtype=np.int64)
+        return cls(
+            text=" ".join(texts),
+            starts=np.array([float(s.get("start", 0.0)) for s in segments], dtype=np.float64),
+            ends=np.array([float(s.get("end", 0.0)) for s in segments], dtype=np.float64),
+            char_offsets=offsets.astype(np.int64),
+            lengths=lengths,
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def segment_at_char(self, offset):
+        """Index of the segment containing character `offset` (O(log n))."""
+        if not len(self):
+            return -1
+        return int(np.clip(np.searchsorted(self.char_offsets, offset, side="right") - 1, 0, len(self) - 1))
+
+    def time_at_char(self, offset):
+        """Audio time in seconds where the text at `offset` was spoken."""
+        index = self.segment_at_char(offset)
+        return float(self.starts[index]) if index >= 0 else 0.0
+
+    def segment_at_time(self, seconds):
+        """Index of the last segment that starts at or before `seconds`."""
+        if not len(self):
+            return -1
+        return int(np.clip(np.searchsorted(self.starts, seconds, side="right") - 1, 0, len(self) - 1))
+
+    def find_time(self, snippet, ignore_case=False):
+        """Audio time of the first occurrence of `snippet` in the transcript, or None."""
+        match = re.search(re.escape(snippet), self.text, re.IGNORECASE if ignore_case else 0)
+        return self.time_at_char(match.start()) if match else None
+
+    def slice_by_time(self, start, end):
+        """Transcript text of all segments overlapping [start, end) seconds."""
+        first = int(np.searchsorted(self.ends, start, side="right"))
+        last = int(np.searchsorted(self.starts, end, side="left"))
+        if first >= last:
+            return ""
+        return self.text[self.char_offsets[first]:self.char_offsets[last - 1] + self.lengths[last - 1]]
+
+    def rebase(self, text):
+        """
+        The same segments laid over `text`, an edited copy of self.text, so that
+        character offsets point into the text the notes were written from.
+        A segment whose words were all removed gets length 0 at the next kept word.
+        """
+        if text == self.text or not len(self):
+            return TranscriptSegments(text, self.starts, self.ends, self.char_offsets, self.lengths)
+        pairs = align_words(self.text, text)
+        target_offsets = np.array([target for target, _ in pairs] + [len(text)], dtype=np.int64)
+        source_offsets = np.array([source for _, source in pairs], dtype=np.int64)
+        # First kept word at or after the start of each segment
+        offsets = target_offsets[np.searchsorted(source_offsets, self.char_offsets, side="left")]
+        ends = target_offsets[np.searchsorted(source_offsets, self.char_offsets + self.lengths, side="left")]
+        # The next segment starts one joining space after this one ends
+        lengths = np.maximum(np.minimum(ends, len(text)) - offsets - (ends < len(text)), 0)
+        return TranscriptSegments(text, self.starts, self.ends, offsets, lengths)
+
+    def to_blob(self):
+        """Serialize to compressed bytes for the database."""
+        buffer = BytesIO()
+        np.savez_compressed(
+            buffer,
+            text=np.frombuffer(self.text.encode("utf-8"), dtype=np.uint8),
+            starts=self.starts,
+            ends=self.ends,
+            char_offsets=self.char_offsets,
+            lengths=self.lengths,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_blob(cls, blob):
+        """Inverse of to_blob()."""
+        with np.load(BytesIO(blob), allow_pickle=False) as data:
+            return cls(
+                text=data["text"].tobytes().decode("utf-8"),
+                starts=data["starts"],
+                ends=data["ends"],
+                char_offsets=data["char_offsets"],
+                lengths=data["lengths"],
+            )
+
+
+def build_transcript_store(segments):
+    """Return a TranscriptSegments for these segments, or None if unavailable."""
+    if not (NUMPY_AVAILABLE and segments):
+        return None
+    return TranscriptSegments.from_segments(segments)
+
+
+def load_transcript_store(blob):
+    """Restore a TranscriptSegments from the database, or None."""
+    if not (NUMPY_AVAILABLE and blob):
+        return None
+    try:
+        return TranscriptSegments.from_blob(blob)
+    except Exception as e:
+        print(f"Could not load transcript segments: {e}")
+        return None
@@ -0,0 +1,229 @@
+"""
+Transcription module for EchoMind
+Splits long recordings at silence boundaries, transcribes the pieces concurrently
+with Whisper and stitches the results back into a single timestamped transcript.
+"""
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_processing import (
+    check_ffprobe_available, get_audio_duration, detect_silences,
+    extract_segment, cleanup_files, get_speech_encoding,
+)
+from voice_activity import trim_silence
+
+WHISPER_MODEL = "whisper-large-v3"
+CHUNK_SECONDS = int(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", 600))
+CHUNK_OVERLAP_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_OVERLAP", 2.0))
+SILENCE_SEARCH_SECONDS = 60
+MAX_TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", 4))
+
+
+def can_chunk_audio():
+    """Chunked transcription needs ffmpeg/ffprobe to measure and cut the audio."""
+    return check_ffprobe_available()
+
+
+def plan_chunks(duration: float, silences: list, chunk_seconds: float = CHUNK_SECONDS,
+                overlap: float = CHUNK_OVERLAP_SECONDS, search_window: float = SILENCE_SEARCH_SECONDS) -> list:
+    """
+    Choose cut points close to every `chunk_seconds`, preferring the middle of a
+    detected silence inside the preceding `search_window`. Each chunk is padded
+    by `overlap` seconds on both sides so words on a boundary are never lost.
+    Returns a list of dicts with `start`, `end` (padded) and `cut_start`, `cut_end`.
+    """
+    if duration <= 0:
+        return []
+
+    silence_midpoints = sorted((start + end) / 2 for start, end in silences)
+    cuts = [0.0]
+    while duration - cuts[-1] > chunk_seconds:
+        target = cuts[-1] + chunk_seconds
+        candidates = [m for m in silence_midpoints if target - search_window <= m <= target and m > cuts[-1]]
+        cuts.append(max(candidates) if candidates else target)
+    cuts.append(duration)
+
+    chunks = []
+    for index in range(len(cuts) - 1):
+        cut_start, cut_end = cuts[index], cuts[index + 1]
+        chunks.append({
+            "index": index,
+            "cut_start": cut_start,
+            "cut_end": cut_end,
+            "start": max(cut_start - overlap, 0.0),
+            "end": min(cut_end + overlap, duration),
+        })
+    return chunks
+
+
+def _segment_value(segment, key, default=None):
+    """Whisper segments come back as dicts or objects depending on the SDK version."""
+    if isinstance(segment, dict):
+        return segment.get(key, default)
+    return getattr(segment, key, default)
+
+
+def transcribe_chunk(groq_client, chunk_path: str, language: str = "auto", prompt: str = "") -> dict:
+    """
+    Transcribe a single audio file with verbose output.
+    Returns {"text": str, "segments": [{"start", "end", "text"}]} with times relative to the file.
+    """
+    kwargs = {
+        "model": WHISPER_MODEL,
+        "prompt": prompt,
+        "response_format": "verbose_json",
+        "temperature": 0.0,
+    }
+    if language and language != "auto":
+        kwargs["language"] = language
+
+    # Rate limits and transient errors are retried by the shared limiter (rate_limiter.RateLimitedClient)
+    with open(chunk_path, "rb") as f:
+        transcription = groq_client.audio.transcriptions.create(
+            file=(os.path.basename(chunk_path), f.read()), **kwargs
+        )
+
+    segments = []
+    for segment in getattr(transcription, "segments", None) or []:
+        segments.append({
+            "start": float(_segment_value(segment, "start", 0.0)),
+            "end": float(_segment_value(segment, "end", 0.0)),
+            "text": (_segment_value(segment, "text", "") or "").strip(),
+        })
+    return {"text": transcription.text, "segments": segments}
+
+
+def transcribe_voiced_chunk(groq_client, chunk_path: str, language: str = "auto") -> dict:
+    """
+    Cut long pauses out of a chunk before transcribing it, then translate the
+    segment times back to the untrimmed chunk.
+    """
+    try:
+        trimmed_path, time_map = trim_silence(chunk_path)
+    except Exception as e:
+        print(f"Voice activity trimming failed, using untrimmed chunk: {e}")
+        trimmed_path, time_map = chunk_path, None
+
+    try:
+        result = transcribe_chunk(groq_client, trimmed_path, language)
+    finally:
+        if trimmed_path != chunk_path:
+            cleanup_files([trimmed_path])
+    if time_map is not None:
+        time_map.map_segments(result["segments"])
+    return result
+
+
+def _merge_boundary_words(previous_words: list, next_words: list, max_overlap: int = 30) -> list:
+    """
+    Drop words from the start of `next_words` that repeat the tail of `previous_words`.
+    Compares case-insensitively and ignores punctuation.
+    """
+    def norm(word):
+        return "".join(c for c in word.lower() if c.isalnum())
+
+    limit = min(max_overlap, len(previous_words), len(next_words))
+    tail = [norm(w) for w in previous_words[-limit:]] if limit else []
+    head = [norm(w) for w in next_words[:limit]]
+    for size in range(limit, 0, -1):
+        if tail[-size:] == head[:size] and any(tail[-size:]):
+            return next_words[size:]
+    return next_words
+
+
+def stitch_transcripts(chunks: list, results: list) -> dict:
+    """
+    Merge per-chunk results into one transcript with global timestamps.
+    Segments are kept by which side of the cut point their midpoint falls on,
+    and any words still duplicated across a boundary are removed.
+    """
+    stitched_segments = []
+    for chunk, result in zip(chunks, results):
+        offset = chunk["start"]
+        segments = result.get("segments") or []
+        if not segments and result.get("text"):
+            segments = [{"start": 0.0, "end": chunk["end"] - chunk["start"], "text": result["text"].strip()}]
+
+        for segment in segments:
+            start = segment["start"] + offset
+            end = segment["end"] + offset
+            midpoint = (start + end) / 2
+            if midpoint < chunk["cut_start"] or midpoint >= chunk["cut_end"]:
+                continue
+            words = segment["text"].split()
+            if stitched_segments and stitched_segments[-1]["chunk"] != chunk["index"]:
+                words = _merge_boundary_words(stitched_segments[-1]["text"].split(), words)
+            if not words:
+                continue
+            stitched_segments.append({"start": start, "end": end, "text": " ".join(words), "chunk": chunk["index"]})
+
+    for segment in stitched_segments:
+        segment.pop("chunk", None)
+    text = " ".join(segment["text"] for segment in stitched_segments)
+    return {"text": text, "segments": stitched_segments}
+
+
+def transcribe_long_audio(groq_client, path: str, language: str = "auto",
+                          max_workers: int = MAX_TRANSCRIBE_WORKERS, external_logger=lambda x: None) -> dict:
+    """
+    Transcribe an audio file of any length.
+    The file is cut at silences into overlapping chunks that are transcribed on a
+    bounded worker pool, then stitched back in order.
+    Returns {"text": str, "segments": list}.
+    """
+    duration = get_audio_duration(path)
+    silences = detect_silences(path) if duration > CHUNK_SECONDS else []
+    chunks = plan_chunks(duration, silences)
+    if not chunks:
+        raise ValueError("Could not read the audio duration for chunked transcription.")
+
+    _, extension = get_speech_encoding()
+    work_dir = tempfile.mkdtemp(prefix="echomind_chunks_")
+    chunk_paths = []
+    try:
+        for chunk in chunks:
+            chunk_path = os.path.join(work_dir, f"chunk_{chunk['index']:04d}{extension}")
+            extract_segment(path, chunk["start"], chunk["end"], chunk_path)
+            chunk_paths.append(chunk_path)
+
+        external_logger(f"Transcribing {len(chunks)} audio chunk(s) with {min(max_workers, len(chunks))} worker(s) ....")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+            results = list(executor.map(lambda p: transcribe_voiced_chunk(groq_client, p, language), chunk_paths))
+        return stitch_transcripts(chunks, results)
+    finally:
+        cleanup_files(chunk_paths)
+        try:
+            os.rmdir(work_dir)
+        except OSError:
+            pass
+
+
+def transcribe_segment_stream(groq_client, segments, language: str = "auto",
+                              max_workers: int = MAX_TRANSCRIBE_WORKERS, external_logger=lambda x: None) -> dict:
+    """
+    Transcribe audio segments as they are produced, e.g. by a download that is
+    still in progress. `segments` yields (path, start, end, cut_start, cut_end) with
+    global times, where the padded [start, end) overlaps its neighbours and
+    [cut_start, cut_end) is the range the segment is responsible for.
+    Each segment file is removed once it has been transcribed.
+    Returns {"text": str, "segments": list}.
+    """
+    def work(path):
+        try:
+            return transcribe_voiced_chunk(groq_client, path, language)
+        finally:
+            cleanup_files([path])
+
+    chunks = []
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for index, (path, start, end, cut_start, cut_end) in enumerate(segments):
+            chunks.append({"index": index, "start": start, "end": end, "cut_start": cut_start, "cut_end": cut_end})
+            futures.append(executor.submit(work, path))
+            external_logger(f"Transcribing segment {index + 1} ....")
+        results = [future.result() for future in futures]
+
+    if not chunks:
+        raise ValueError("No audio was received from the stream.")
+    return stitch_transcripts(chunks, results)
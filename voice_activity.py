@@ -0,0 +1,149 @@
+"""
+Voice Activity module for EchoMind
+CPU-only, NumPy-vectorized voice activity detection used to cut long pauses out of
+recordings before they are transcribed, with a time map back to the original audio.
+"""
+import os
+import subprocess
+
+from audio_processing import get_speech_encoding, AUDIO_SAMPLE_RATE
+
+# NumPy is optional; without it audio is transcribed untrimmed
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "1") != "0"
+FRAME_SECONDS = 0.03
+MIN_SILENCE_SECONDS = float(os.environ.get("VAD_MIN_SILENCE", 1.0))
+SPEECH_PADDING_SECONDS = 0.25
+NOISE_MARGIN_DB = 10.0
+MIN_SPEECH_DB = -50.0
+
+
+class TimeMap:
+    """
+    Maps times in trimmed audio back to times in the original recording.
+    Each kept span starts at `trimmed_starts[i]` in the trimmed audio and at
+    `original_starts[i]` in the original.
+    """
+    def __init__(self, kept_spans):
+        self.kept_spans = list(kept_spans)
+        lengths = np.array([end - start for start, end in self.kept_spans], dtype=np.float64)
+        self.original_starts = np.array([start for start, _ in self.kept_spans], dtype=np.float64)
+        self.trimmed_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1])) if len(lengths) else np.zeros(0)
+        self.trimmed_duration = float(lengths.sum()) if len(lengths) else 0.0
+
+    def to_original(self, t):
+        """Translate a time (or array of times) in the trimmed audio to the original audio."""
+        if not len(self.trimmed_starts):
+            return t
+        times = np.asarray(t, dtype=np.float64)
+        index = np.clip(np.searchsorted(self.trimmed_starts, times, side="right") - 1, 0, len(self.trimmed_starts) - 1)
+        mapped = self.original_starts[index] + (times - self.trimmed_starts[index])
+        return float(mapped) if mapped.ndim == 0 else mapped
+
+    def map_segments(self, segments):
+        """Rewrite the start/end of Whisper segments from trimmed to original time."""
+        for segment in segments:
+            segment["start"] = self.to_original(segment["start"])
+            segment["end"] = self.to_original(segment["end"])
+        return segments
+
+
+def decode_pcm(path: str):
+    """Decode any audio file to mono 16 kHz float32 samples in [-1, 1]."""
+    result = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-i", path,
+            "-f", "s16le", "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE), "-",
+        ],
+        capture_output=True,
+        check=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def detect_speech_spans(samples, sample_rate: int = AUDIO_SAMPLE_RATE,
+                        min_silence: float = MIN_SILENCE_SECONDS, padding: float = SPEECH_PADDING_SECONDS) -> list:
+    """
+    Return (start, end) spans in seconds that contain speech.
+    Frames are classified by RMS energy against an adaptive noise floor; pauses
+    shorter than `min_silence` are kept and every span is padded by `padding`.
+    """
+    frame_length = int(sample_rate * FRAME_SECONDS)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return [(0.0, len(samples) / sample_rate)] if len(samples) else []
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    energy_db = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    threshold = max(np.percentile(energy_db, 10) + NOISE_MARGIN_DB, MIN_SPEECH_DB)
+    speech = energy_db > threshold
+
+    # Bridge pauses shorter than min_silence and pad speech edges by dilating the mask
+    bridge = max(int(min_silence / FRAME_SECONDS), 1)
+    pad = int(padding / FRAME_SECONDS)
+    kernel = np.ones(2 * pad + 1)
+    speech = np.convolve(speech.astype(np.float32), kernel, mode="same") > 0
+
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not len(starts):
+        return []
+
+    gaps = starts[1:] - ends[:-1]
+    keep_break = np.concatenate(([True], gaps >= bridge))
+    merged_starts = starts[keep_break]
+    merged_ends = np.concatenate((ends[:-1][keep_break[1:]], [ends[-1]]))
+
+    duration = len(samples) / sample_rate
+    return [
+        (float(start * FRAME_SECONDS), float(min(end * FRAME_SECONDS, duration)))
+        for start, end in zip(merged_starts, merged_ends)
+    ]
+
+
+def encode_pcm(samples, output_path: str) -> str:
+    """Encode float32 samples to the configured speech codec."""
+    args, _ = get_speech_encoding()
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "s16le", "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE), "-i", "-",
+        ] + args + [output_path],
+        input=pcm,
+        capture_output=True,
+        check=True,
+    )
+    return output_path
+
+
+def trim_silence(path: str):
+    """
+    Remove long non-speech spans from an audio file.
+    Returns (trimmed_path, TimeMap). If nothing worth removing was found, or VAD
+    is unavailable, returns (path, None) and the original file should be used.
+    """
+    if not (VAD_ENABLED and NUMPY_AVAILABLE):
+        return path, None
+
+    samples = decode_pcm(path)
+    spans = detect_speech_spans(samples)
+    duration = len(samples) / AUDIO_SAMPLE_RATE
+    kept = sum(end - start for start, end in spans)
+    if not spans or kept >= duration * 0.95:
+        return path, None
+
+    pieces = [samples[int(start * AUDIO_SAMPLE_RATE):int(end * AUDIO_SAMPLE_RATE)] for start, end in spans]
+    _, extension = get_speech_encoding()
+    trimmed_path = os.path.splitext(path)[0] + "_voiced" + extension
+    encode_pcm(np.concatenate(pieces), trimmed_path)
+    print(f"Voice activity trimming kept {kept:.1f}s of {duration:.1f}s")
+    return trimmed_path, TimeMap(spans)
@@ -0,0 +1,155 @@
+"""
+YouTube Captions module for EchoMind
+Builds transcripts from YouTube caption tracks and note outlines from video chapters,
+so videos that already carry them can skip Whisper and outline generation.
+"""
+import json
+import re
+from collections import OrderedDict
+
+import yt_dlp as youtube_dl
+
+from download import get_ydl_opts, resolve_video_info
+
+PREFERRED_CAPTION_FORMATS = ["json3", "vtt"]
+MIN_CHAPTERS = 2
+
+
+def _matching_tracks(tracks, language):
+    for lang, formats in (tracks or {}).items():
+        if lang == language or lang.startswith(language + "-"):
+            # Machine-translated auto captions are not the spoken language
+            usable = [fmt for fmt in formats if "tlang=" not in (fmt.get("url") or "")]
+            if usable:
+                return usable
+    return None
+
+
+def find_caption_track(info, language="auto"):
+    """
+    Pick a caption track for the requested language, preferring uploaded subtitles
+    over automatic captions and json3 over vtt. Returns the format dict or None.
+    """
+    if not language or language == "auto":
+        language = info.get("language") or "en"
+    language = language.split("-")[0]
+
+    for source in ("subtitles", "automatic_captions"):
+        formats = _matching_tracks(info.get(source), language)
+        if not formats:
+            continue
+        for ext in PREFERRED_CAPTION_FORMATS:
+            for fmt in formats:
+                if fmt.get("ext") == ext and fmt.get("url"):
+                    return fmt
+    return None
+
+
+def parse_json3_captions(raw):
+    """Parse YouTube's json3 caption format into timed segments."""
+    segments = []
+    for event in json.loads(raw).get("events", []):
+        text = "".join(seg.get("utf8", "") for seg in event.get("segs") or []).replace("\n", " ").strip()
+        if not text:
+            continue
+        start = event.get("tStartMs", 0) / 1000.0
+        segments.append({"start": start, "end": start + event.get("dDurationMs", 0) / 1000.0, "text": text})
+    return segments
+
+
+def _vtt_seconds(stamp):
+    parts = stamp.replace(",", ".").split(":")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_vtt_captions(raw):
+    """
+    Parse WebVTT captions into timed segments.
+    Auto captions repeat the previous line in each cue, so repeated lines are dropped.
+    """
+    segments = []
+    previous_lines = set()
+    for block in re.split(r"\n\s*\n", raw.replace("\r\n", "\n")):
+        lines = block.strip().split("\n")
+        timing = next((i for i, line in enumerate(lines) if "-->" in line), None)
+        if timing is None:
+            continue
+        start, end = [part.strip().split(" ")[0] for part in lines[timing].split("-->")]
+        cue_lines = [re.sub(r"<[^>]+>", "", line).strip() for line in lines[timing + 1:]]
+        new_lines = [line for line in cue_lines if line and line not in previous_lines]
+        previous_lines = set(cue_lines)
+        if new_lines:
+            segments.append({"start": _vtt_seconds(start), "end": _vtt_seconds(end), "text": " ".join(new_lines)})
+    return segments
+
+
+def fetch_captions(ydl, track):
+    """Download a caption track and return {"text", "segments"}."""
+    raw = ydl.urlopen(track["url"]).read().decode("utf-8", errors="ignore")
+    if track.get("ext") == "json3":
+        segments = parse_json3_captions(raw)
+    else:
+        segments = parse_vtt_captions(raw)
+    text = " ".join(segment["text"] for segment in segments)
+    return {"text": re.sub(r"\s+", " ", text).strip(), "segments": segments}
+
+
+def _format_timestamp(seconds):
+    seconds = int(seconds or 0)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+def chapters_to_structure(info):
+    """
+    Turn the video's chapters into a notes structure of {title: description} and
+    the (start, end) seconds of each section, so sections can be written from
+    their own part of the transcript.
+    Returns (None, {}) when the video has fewer than MIN_CHAPTERS chapters.
+    """
+    chapters = info.get("chapters") or []
+    if len(chapters) < MIN_CHAPTERS:
+        return None, {}
+
+    structure = OrderedDict()
+    times = {}
+    for chapter in chapters:
+        title = (chapter.get("title") or "").strip() or f"Part {len(structure) + 1}"
+        unique_title = title
+        suffix = 2
+        while unique_title in structure:
+            unique_title = f"{title} ({suffix})"
+            suffix += 1
+        start = _format_timestamp(chapter.get("start_time"))
+        end = _format_timestamp(chapter.get("end_time"))
+        structure[unique_title] = f"Everything the speaker covers in the chapter \"{title}\" ({start} - {end} of the video)"
+        times[unique_title] = (float(chapter.get("start_time") or 0.0), float(chapter.get("end_time") or info.get("duration") or float("inf")))
+    return structure, times
+
+
+def get_youtube_fast_path(url, language="auto", external_logger=lambda x: None):
+    """
+    Look for captions and chapters on a YouTube video.
+    Returns {"transcript": str or None, "segments": list, "structure": dict or None,
+    "chapter_times": {section title: (start, end) seconds}}.
+    """
+    result = {"transcript": None, "segments": [], "structure": None, "chapter_times": {}}
+    ydl_opts = get_ydl_opts(external_logger, use_ffmpeg=False)
+    with youtube_dl.YoutubeDL(ydl_opts) as ydl:
+        info, _ = resolve_video_info(ydl, url)
+        result["structure"], result["chapter_times"] = chapters_to_structure(info)
+
+        track = find_caption_track(info, language)
+        if track:
+            try:
+                captions = fetch_captions(ydl, track)
+                if captions["text"]:
+                    result["transcript"] = captions["text"]
+                    result["segments"] = captions["segments"]
+            except Exception as e:
+                print(f"Could not fetch captions for {url}: {e}")
+    return result